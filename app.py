@@ -13,13 +13,18 @@ Version: 0.1.0
 """
 
 import streamlit as st
+import hashlib
+import importlib.util
 import json
 import logging
 import os
+import pathlib
 import sys
-from typing import Any, Optional
-from PIL import Image
-import io
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Python 3.12+ type aliases for better code readability
 type MedicalData = dict[str, Any]
@@ -35,73 +40,213 @@ if sys.version_info < (3, 12):
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Import custom modules with error handling
+# orjson parses and serializes several times faster than the stdlib json module
 try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Heavy modules (PaddleOCR, Plotly, pandas, AI clients) are imported on first use
+# because Streamlit re-executes this script on every widget interaction
+
+
+@st.cache_resource(show_spinner=False)
+def _ocr_available() -> bool:
+    """Check once per server process whether the OCR module imports and PaddleOCR loaded."""
+    # Skip the heavy import when PaddleOCR is not installed at all
+    if importlib.util.find_spec("paddleocr") is None:
+        return False
+    try:
+        from src.medical_ocr.ocr_processor import PADDLEOCR_AVAILABLE as ocr_loaded
+        return ocr_loaded
+    except Exception as e:
+        logger.warning(f"OCR module import failed: {e}")
+        return False
+
+
+# Decoder for the stdlib fallback, called directly to skip json.loads argument handling
+_JSON_DECODER = json.JSONDecoder()
+
+
+def json_loads(text: str) -> Any:
+    """Parse JSON text, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(text.encode())
+    return _JSON_DECODER.decode(text)
+
+
+def json_dumps(data: Any, sort_keys: bool = False) -> str:
+    """Serialize data as compact JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS if sort_keys else None).decode()
+    return json.dumps(data, sort_keys=sort_keys)
+
+
+def json_dumps_indented(data: Any) -> str:
+    """Serialize data as 2-space indented JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(data, indent=2)
+
+
+@st.cache_resource(show_spinner=False)
+def load_environment():
+    """Load the .env next to this file once per server process, if there is one."""
+    # Hosted deployments set variables directly, so skip the dotenv import and search
+    env_file = pathlib.Path(__file__).with_name(".env")
+    if env_file.is_file():
+        from dotenv import load_dotenv
+        load_dotenv(env_file)
+
+
+load_environment()
+
+# Default API keys; these lookups rerun with the script, but only read os.environ
+DEFAULT_HF_KEY = os.getenv("HUGGINGFACE_API_KEY", "")
+DEFAULT_GEMINI_KEY = os.getenv("GEMINI_API_KEY", "")
+
+# Optional directory for persisting recommendations across restarts
+CACHE_DIR = os.getenv("SEHATSCAN_CACHE_DIR") or None
+
+# Seconds to wait for recommendations before giving up on this run
+RECOMMENDATION_TIMEOUT = 180
+
+# Sidebar status for each (has Hugging Face key, has Gemini key) combination
+_KEY_STATUS = {
+    (False, False): ("error", "❌ No API keys provided - specialist recommendations unavailable"),
+    (False, True): ("success", "✅ Gemini-only mode enabled (handles both medical analysis and formatting)"),
+    (True, False): ("info", "ℹ️ Hugging Face mode (medical analysis + formatting)"),
+    (True, True): ("success", "✅ Optimal setup: Hugging Face + Gemini (fastest processing)"),
+}
+
+# (key, label) pairs rendered side by side, one column each
+_PATIENT_FIELDS = (("name", "Name"), ("dob", "DOB"), ("sex", "Sex"))
+_REPORT_FIELDS = (("report_date", "Date"), ("specimen", "Specimen"), ("accession", "Accession"))
+_DIET_SECTIONS = (("foods_to_include", "Foods to Include"), ("foods_to_avoid", "Foods to Avoid"))
+_EXERCISE_SECTIONS = (("cardiovascular", "Cardiovascular Exercise"), ("strength_training", "Strength Training"))
+_GENERAL_SECTIONS = (("lifestyle_changes", "Lifestyle Changes"), ("monitoring", "Monitoring"), ("follow_up", "Follow-up"))
+
+
+@st.cache_resource(show_spinner=False)
+def get_visualizer():
+    """Build the visualizer once per server process (imports Plotly lazily)."""
+    from src.visualizer import MedicalDataVisualizer
+    return MedicalDataVisualizer()
+
+
+@st.cache_resource(show_spinner=False)
+def get_ocr_processor():
+    """Load the PaddleOCR models once per server process; failures are not cached."""
     from src.medical_ocr import MedicalOCRProcessor
-    OCR_IMPORT_SUCCESS = True
-except Exception as e:
-    logger.warning(f"OCR module import failed: {e}")
-    MedicalOCRProcessor = None
-    OCR_IMPORT_SUCCESS = False
+    return MedicalOCRProcessor()
 
-from src.visualizer import MedicalDataVisualizer
-from src.specialist import SpecialistAdvisor
 
-# Load environment variables
-from dotenv import load_dotenv
-load_dotenv()
+@st.cache_resource(show_spinner=False)
+def get_specialist_advisor(api_key: str, gemini_key: Optional[str]):
+    """Build (once per key pair) the specialist advisor and its AI clients."""
+    from src.specialist import SpecialistAdvisor
+    advisor = SpecialistAdvisor(api_key, gemini_key, cache_dir=CACHE_DIR)
+    logger.info("Specialist advisor initialized successfully")
+    return advisor
 
 
-class SehatScanApp:
-    """Main application class for SehatScan."""
+def initialize_ocr():
+    """Initialize OCR processor (lazy loading for performance)."""
+    if not _ocr_available():
+        st.error("❌ OCR functionality not available")
+        st.info(
+            "🔄 **Alternative Options:**\n"
+            "- Use the 'Input JSON' tab to paste medical data directly\n"
+            "- OCR dependencies may not be available on this platform\n"
+            "- For local development, install with: `uv sync --extra ocr`"
+        )
+        return None
     
-    def __init__(self):
-        """Initialize the application components."""
-        self.ocr_processor = None
-        self.visualizer = MedicalDataVisualizer()
-        self.specialist_advisor = None
-        
-    def initialize_ocr(self):
-        """Initialize OCR processor (lazy loading for performance)."""
-        if self.ocr_processor is None:
-            if not OCR_IMPORT_SUCCESS or MedicalOCRProcessor is None:
-                st.error("❌ OCR functionality not available")
-                st.info(
-                    "🔄 **Alternative Options:**\n"
-                    "- Use the 'Input JSON' tab to paste medical data directly\n"
-                    "- OCR dependencies may not be available on this platform\n"
-                    "- For local development, install with: `uv sync --extra ocr`"
-                )
-                return None
-            
-            with st.spinner("Initializing OCR processor..."):
-                try:
-                    self.ocr_processor = MedicalOCRProcessor()
-                except Exception as e:
-                    st.error(f"❌ OCR initialization failed: {str(e)}")
-                    st.info("💡 You can still use the JSON input feature!")
-                    return None
-        return self.ocr_processor
-    
-    def initialize_specialist_advisor(self, api_key: str):
-        """Initialize specialist advisor with API key."""
-        if self.specialist_advisor is None:
-            # Get Gemini API key from environment
-            gemini_key = os.getenv("GEMINI_API_KEY")
-            
-            # Need at least one API key to work
-            if api_key or gemini_key:
-                try:
-                    self.specialist_advisor = SpecialistAdvisor(api_key, gemini_key)
-                    logger.info("Specialist advisor initialized successfully")
-                except Exception as e:
-                    logger.error(f"Failed to initialize specialist advisor: {e}")
-                    self.specialist_advisor = None
-            else:
-                logger.warning("No API keys provided for specialist advisor")
-                self.specialist_advisor = None
-        
-        return self.specialist_advisor
+    with st.spinner("Initializing OCR processor..."):
+        try:
+            return get_ocr_processor()
+        except Exception as e:
+            st.error(f"❌ OCR initialization failed: {str(e)}")
+            st.info("💡 You can still use the JSON input feature!")
+            return None
+
+
+def initialize_specialist_advisor(api_key: str, gemini_key: str):
+    """Initialize specialist advisor with API keys."""
+    # Need at least one API key to work
+    if not api_key and not gemini_key:
+        logger.warning("No API keys provided for specialist advisor")
+        return None
+    
+    try:
+        # Cached per key pair, so the process-wide cache never hands
+        # one user's credentials to another
+        return get_specialist_advisor(api_key, gemini_key)
+    except Exception as e:
+        logger.error(f"Failed to initialize specialist advisor: {e}")
+        return None
+
+
+def request_recommendations(specialist_advisor, medical_data: MedicalData) -> Future:
+    """Start this session's recommendation request for the report, reusing one already made for it."""
+    report_hash = hashlib.blake2b(json_dumps(medical_data, sort_keys=True).encode(), digest_size=16).hexdigest()
+    key = (id(specialist_advisor), report_hash)
+    
+    # Reruns (e.g. sidebar keystrokes) keep the in-flight request rather than queueing
+    # duplicates; a finished request that failed is retried
+    in_flight = st.session_state.get("_recommendations")
+    if in_flight is not None and in_flight[0] == key:
+        future = in_flight[1]
+        if not future.done() or 'error' not in future.result():
+            return future
+    elif in_flight is not None:
+        in_flight[1].cancel()
+    
+    # One worker per session, so sessions never wait on each other's LLM calls
+    executor = st.session_state.get("_executor")
+    if executor is None:
+        executor = st.session_state["_executor"] = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sehatscan")
+    
+    future = executor.submit(specialist_advisor.get_health_recommendations, medical_data)
+    st.session_state["_recommendations"] = (key, future)
+    return future
+
+
+# Custom CSS as a plain literal: Streamlit reuses the compiled script, so each
+# rerun loads this constant without rebuilding it
+_CSS = """
+<style>
+.main {
+    padding: 1rem;
+}
+.stButton > button {
+    background: #3b82f6;
+    color: white;
+    border-radius: 5px;
+    border: none;
+    padding: 0.5rem 1rem;
+}
+.stButton > button:hover {
+    background: #2563eb;
+}
+.success-box {
+    padding: 1rem;
+    border-radius: 5px;
+    background-color: #d4edda;
+    border: 1px solid #c3e6cb;
+    color: #155724;
+    margin: 1rem 0;
+}
+.error-box {
+    padding: 1rem;
+    border-radius: 5px;
+    background-color: #f8d7da;
+    border: 1px solid #f5c6cb;
+    color: #721c24;
+    margin: 1rem 0;
+}
+</style>
+"""
 
 
 def configure_page():
@@ -113,40 +258,9 @@ def configure_page():
         initial_sidebar_state="expanded"
     )
     
-    # Custom CSS
-    st.markdown("""
-    <style>
-    .main {
-        padding: 1rem;
-    }
-    .stButton > button {
-        background: #3b82f6;
-        color: white;
-        border-radius: 5px;
-        border: none;
-        padding: 0.5rem 1rem;
-    }
-    .stButton > button:hover {
-        background: #2563eb;
-    }
-    .success-box {
-        padding: 1rem;
-        border-radius: 5px;
-        background-color: #d4edda;
-        border: 1px solid #c3e6cb;
-        color: #155724;
-        margin: 1rem 0;
-    }
-    .error-box {
-        padding: 1rem;
-        border-radius: 5px;
-        background-color: #f8d7da;
-        border: 1px solid #f5c6cb;
-        color: #721c24;
-        margin: 1rem 0;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    # Streamlit removes elements that a rerun does not emit again, so the
+    # style block has to be sent every run; the frontend skips unchanged ones
+    st.markdown(_CSS, unsafe_allow_html=True)
 
 
 def render_sidebar():
@@ -154,52 +268,31 @@ def render_sidebar():
     st.sidebar.title("🩺 SehatScan")
     st.sidebar.markdown("---")
     
-    # Check for environment variables first
-    default_hf_key = os.getenv("HUGGINGFACE_API_KEY", "")
-    default_gemini_key = os.getenv("GEMINI_API_KEY", "")
-    
     api_key = st.sidebar.text_input(
         "Hugging Face API Key",
-        value=default_hf_key,
+        value=DEFAULT_HF_KEY,
         type="password",
         help="For medical analysis. Can be omitted if Gemini key is provided."
     )
     
     gemini_key = st.sidebar.text_input(
         "Gemini API Key",
-        value=default_gemini_key,
+        value=DEFAULT_GEMINI_KEY,
         type="password",
         help="Can handle both medical analysis and formatting. Faster than Hugging Face."
     )
     
-    # Set Gemini key in environment for the specialist advisor
-    if gemini_key:
-        os.environ["GEMINI_API_KEY"] = gemini_key
-    
     # Show API key status
-    if not api_key and not gemini_key:
-        st.sidebar.error("❌ No API keys provided - specialist recommendations unavailable")
-    elif not api_key and gemini_key:
-        st.sidebar.success("✅ Gemini-only mode enabled (handles both medical analysis and formatting)")
-    elif api_key and not gemini_key:
-        st.sidebar.info("ℹ️ Hugging Face mode (medical analysis + formatting)")
-    elif api_key and gemini_key:
-        st.sidebar.success("✅ Optimal setup: Hugging Face + Gemini (fastest processing)")
+    method, message = _KEY_STATUS[(bool(api_key), bool(gemini_key))]
+    getattr(st.sidebar, method)(message)
     
     st.sidebar.markdown("---")
     
     # Application Info
     st.sidebar.subheader("ℹ️ About")
     # Check OCR availability for sidebar info
-    if OCR_IMPORT_SUCCESS:
-        try:
-            from src.medical_ocr.ocr_processor import PADDLEOCR_AVAILABLE
-            if PADDLEOCR_AVAILABLE:
-                ocr_status = "📄 **Smart OCR** - Reads your report images"
-            else:
-                ocr_status = "📝 **JSON Input** - Paste your medical data directly"
-        except:
-            ocr_status = "📝 **JSON Input** - Paste your medical data directly"
+    if _ocr_available():
+        ocr_status = "📄 **Smart OCR** - Reads your report images"
     else:
         ocr_status = "📝 **JSON Input** - Paste your medical data directly"
     
@@ -211,30 +304,37 @@ def render_sidebar():
         f"🔒 **Privacy First** - Your data stays on your device"
     )
     
-    return api_key
+    return api_key, gemini_key
 
 
-def render_file_upload():
-    """Render file upload section."""
+def render_file_upload() -> list[bytes]:
+    """Render file upload section and return the raw bytes of each uploaded page."""
     st.subheader("📄 Upload Medical Document")
     
-    uploaded_file = st.file_uploader(
-        "Choose your medical report image",
+    uploaded_files = st.file_uploader(
+        "Choose your medical report images",
         type=['png', 'jpg', 'jpeg', 'pdf'],
-        help="Upload a clear image of your medical report"
+        accept_multiple_files=True,
+        help="Upload clear images of your medical report (one per page)"
     )
     
-    if uploaded_file is not None:
-        # Display uploaded image
+    pages = []
+    for uploaded_file in uploaded_files or []:
+        # Display uploaded image straight from its encoded bytes (no PIL decode)
         if uploaded_file.type.startswith('image'):
-            image = Image.open(uploaded_file)
-            st.image(image, caption="Your Medical Report", use_container_width=True)
-            return image
+            page = uploaded_file.getvalue()
+            st.image(page, caption=f"Your Medical Report: {uploaded_file.name}", use_container_width=True)
+            pages.append(page)
         else:
-            st.error("PDF processing not yet implemented. Please upload an image file.")
-            return None
+            st.error(f"PDF processing not yet implemented. Please upload {uploaded_file.name} as an image file.")
     
-    return None
+    return pages
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def parse_json_input(json_input: str) -> MedicalData:
+    """Parse the JSON textarea once per distinct content."""
+    return json_loads(json_input)
 
 
 def render_json_input():
@@ -249,28 +349,43 @@ def render_json_input():
     
     if json_input:
         try:
-            data = json.loads(json_input)
+            # Only re-parse when the text actually changed since the last rerun
+            if json_input != st.session_state.get("_json_cache_key"):
+                st.session_state["_json_cache_val"] = parse_json_input(json_input)
+                st.session_state["_json_cache_key"] = json_input
             st.success("✅ Valid JSON format")
-            return data
+            return st.session_state["_json_cache_val"]
         except json.JSONDecodeError as e:
             st.error(f"❌ Invalid JSON format: {str(e)}")
     
     return None
 
 
-def process_medical_document(app: SehatScanApp, image: Image.Image) -> Optional[MedicalData]:
-    """Process medical document using OCR."""
+def merge_pages(pages: list[MedicalData]) -> MedicalData:
+    """Merge per-page OCR results into a single report (first value wins)."""
+    merged = {"patient": {}, "report_details": {}, "observations": []}
+    
+    for page in pages:
+        for section in ("patient", "report_details"):
+            for field, value in page.get(section, {}).items():
+                merged[section].setdefault(field, value)
+        merged["observations"].extend(page.get("observations", []))
+    
+    return merged
+
+
+def process_medical_document(pages: list[bytes]) -> Optional[MedicalData]:
+    """Process medical document pages using OCR."""
     try:
         with st.spinner("🔍 Processing medical document with OCR..."):
-            ocr_processor = app.initialize_ocr()
-            
-            # Convert PIL image to format suitable for OCR
-            img_byte_arr = io.BytesIO()
-            image.save(img_byte_arr, format='PNG')
-            img_byte_arr = img_byte_arr.getvalue()
+            ocr_processor = initialize_ocr()
             
-            # Process with OCR
-            medical_data = ocr_processor.process_image(img_byte_arr)
+            # Uploaded JPEG/PNG bytes go to OCR as-is, with no decode/re-encode
+            if len(pages) == 1:
+                medical_data = ocr_processor.process_image(pages[0])
+            else:
+                # Run every page through OCR in a single batched call
+                medical_data = merge_pages(ocr_processor.process_image_batch(pages))
             
             st.success("✅ OCR processing completed successfully!")
             return medical_data
@@ -281,103 +396,142 @@ def process_medical_document(app: SehatScanApp, image: Image.Image) -> Optional[
         return None
 
 
+@st.cache_data(show_spinner=False)
+def observations_frame(observations_json: str) -> "pd.DataFrame":
+    """Build the test results table once per distinct set of observations."""
+    import pandas as pd
+    
+    df = pd.DataFrame(json_loads(observations_json))
+    
+    # Cast fully numeric columns so the Arrow schema is stable; columns with
+    # values like "<5" stay as text rather than losing them to NaN
+    for column in df.columns:
+        numeric = pd.to_numeric(df[column], errors='coerce')
+        if numeric.notna().sum() == df[column].notna().sum():
+            df[column] = numeric
+    
+    # Returned as pandas: Streamlit converts mixed-type columns (e.g. 13.5 next
+    # to "<5") to text, where a direct Arrow conversion would raise
+    return df
+
+
+def render_fields(heading: str, values: dict[str, Any], fields: tuple[tuple[str, str], ...]):
+    """Write the present fields as a one-row markdown table under a bold heading."""
+    present = [(label, values[key]) for key, label in fields if values.get(key) is not None]
+    if not present:
+        st.markdown(f"**{heading}:**")
+        return
+    
+    header = " | ".join(label for label, _ in present)
+    divider = " | ".join("---" for _ in present)
+    row = " | ".join(str(value).replace("|", "\\|") for _, value in present)
+    st.markdown(f"**{heading}:**\n\n| {header} |\n| {divider} |\n| {row} |")
+
+
+def render_bullets(items: list[Any], heading: Optional[str] = None):
+    """Write a list as one markdown element rather than one element per item."""
+    lines = [f"**{heading}:**\n"] if heading else []
+    lines.extend(f"- {item}" for item in items)
+    if lines:
+        st.markdown("\n".join(lines))
+
+
+def render_list_sections(values: dict[str, Any], sections: tuple[tuple[str, str], ...]):
+    """Write each present list as a bulleted section in its own column."""
+    for col, (key, heading) in zip(st.columns(len(sections)), sections):
+        if (items := values.get(key)) is not None:
+            with col:
+                render_bullets(items, heading)
+
+
 def display_extracted_data(medical_data: MedicalData):
     """Display extracted medical data."""
     st.subheader("📊 Extracted Medical Data")
     
     # Patient Information
     if 'patient' in medical_data and medical_data['patient']:
-        st.write("**Patient Information:**")
-        patient_info = medical_data['patient']
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            if 'name' in patient_info:
-                st.write(f"Name: {patient_info['name']}")
-        with col2:
-            if 'dob' in patient_info:
-                st.write(f"DOB: {patient_info['dob']}")
-        with col3:
-            if 'sex' in patient_info:
-                st.write(f"Sex: {patient_info['sex']}")
+        render_fields("Patient Information", medical_data['patient'], _PATIENT_FIELDS)
     
     # Report Details
     if 'report_details' in medical_data and medical_data['report_details']:
-        st.write("**Report Details:**")
-        report_details = medical_data['report_details']
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            if 'report_date' in report_details:
-                st.write(f"Date: {report_details['report_date']}")
-        with col2:
-            if 'specimen' in report_details:
-                st.write(f"Specimen: {report_details['specimen']}")
-        with col3:
-            if 'accession' in report_details:
-                st.write(f"Accession: {report_details['accession']}")
+        render_fields("Report Details", medical_data['report_details'], _REPORT_FIELDS)
     
     # Test Results
     if 'observations' in medical_data and medical_data['observations']:
         st.write("**Test Results:**")
-        observations_df = st.dataframe(medical_data['observations'], use_container_width=True)
+        st.dataframe(observations_frame(json_dumps(medical_data['observations'])), use_container_width=True)
     
     # Raw JSON (expandable)
     with st.expander("🔍 View Raw JSON Data"):
-        st.json(medical_data)
+        st.code(json_dumps_indented(medical_data), language='json')
 
 
-def create_visualizations(app: SehatScanApp, medical_data: MedicalData):
-    """Create and display visualizations."""
+@st.fragment
+def create_visualizations(medical_data: MedicalData):
+    """Create and display visualizations, rendering each chart as soon as it is built."""
     st.subheader("📈 Data Visualizations")
     
     try:
-        with st.spinner("🎨 Creating visualizations..."):
-            visualizations = app.visualizer.create_visualizations(medical_data)
-        
-        if not visualizations:
-            st.warning("⚠️ No visualizations could be created from the data")
-            return
+        # Reuse this session's figures while the report is unchanged
+        report_key = json_dumps(medical_data, sort_keys=True)
+        cached = st.session_state.get("_visualizations")
+        if cached is not None and cached[0] == report_key:
+            items = cached[1].items()
+        else:
+            items = get_visualizer().iter_visualizations(medical_data)
         
-        st.success(f"✅ Created {len(visualizations)} visualizations")
+        # Pre-allocated slots keep the layout stable while charts stream in
+        status = st.empty()
+        gauge_header = st.empty()
+        gauge_area = st.container()
+        overview_header = st.empty()
+        overview_area = st.container()
         
-        # Group visualizations by type
-        gauge_charts = {k: v for k, v in visualizations.items() if 'gauge' in k}
-        overview_charts = {k: v for k, v in visualizations.items() if 'gauge' not in k}
+        visualizations = {}
+        num_gauges = 0
+        num_overview = 0
+        cols_per_row = 3
+        # One column grid for all gauges; equal-height gauges stay aligned row by row
+        gauge_cols = None
         
-        # Display gauge charts
-        if gauge_charts:
-            st.write("**Individual Test Results:**")
-            
-            # Display gauge charts in columns
-            num_gauges = len(gauge_charts)
-            cols_per_row = 3
+        # Route each chart to its section in the same pass that renders it
+        for name, fig in items:
+            if name.endswith('_gauge'):
+                # Display gauge charts in columns
+                if num_gauges == 0:
+                    gauge_header.write("**Individual Test Results:**")
+                    gauge_cols = gauge_area.columns(cols_per_row)
+                with gauge_cols[num_gauges % cols_per_row]:
+                    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False, 'staticPlot': True})
+                num_gauges += 1
+            else:
+                # Display overview charts
+                if num_overview == 0:
+                    overview_header.write("**Overview Charts:**")
+                overview_area.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+                num_overview += 1
             
-            gauge_items = list(gauge_charts.items())
-            for i in range(0, num_gauges, cols_per_row):
-                cols = st.columns(cols_per_row)
-                for j, col in enumerate(cols):
-                    if i + j < num_gauges:
-                        name, fig = gauge_items[i + j]
-                        with col:
-                            st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+            visualizations[name] = fig
+        
+        st.session_state["_visualizations"] = (report_key, visualizations)
         
-        # Display overview charts
-        if overview_charts:
-            st.write("**Overview Charts:**")
-            for name, fig in overview_charts.items():
-                st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+        if not visualizations:
+            status.warning("⚠️ No visualizations could be created from the data")
+            return
+        
+        status.success(f"✅ Created {len(visualizations)} visualizations")
     
     except Exception as e:
         st.error(f"❌ Failed to create visualizations: {str(e)}")
         logger.error(f"Visualization error: {str(e)}")
 
 
-def generate_recommendations(app: SehatScanApp, medical_data: MedicalData, api_key: str):
-    """Generate AI-powered specialist recommendations."""
+@st.fragment
+def generate_recommendations(api_key: str, gemini_key: str, pending: Optional[Future]):
+    """Display the AI-powered specialist recommendations requested in pending (None if the advisor failed to start)."""
     st.subheader("🩺 Specialist Recommendations")
     
-    if not api_key and not os.getenv("GEMINI_API_KEY"):
+    if not api_key and not gemini_key:
         st.warning("⚠️ Please provide at least one API key (Hugging Face or Gemini) to generate recommendations")
         st.info(
             "**API Key Options:**\n"
@@ -388,17 +542,7 @@ def generate_recommendations(app: SehatScanApp, medical_data: MedicalData, api_k
         return
     
     try:
-        # Show progress steps for better UX
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        status_text.text("🔧 Initializing AI models...")
-        progress_bar.progress(20)
-        specialist_advisor = app.initialize_specialist_advisor(api_key)
-        
-        if specialist_advisor is None:
-            progress_bar.empty()
-            status_text.empty()
+        if pending is None:
             st.error("❌ Failed to initialize AI services")
             st.info(
                 "**Please check:**\n"
@@ -408,30 +552,22 @@ def generate_recommendations(app: SehatScanApp, medical_data: MedicalData, api_k
             )
             return
         
-        status_text.text("🧠 Analyzing medical data...")
-        progress_bar.progress(40)
-        
-        status_text.text("💊 Generating diet recommendations...")
-        progress_bar.progress(60)
-        
-        status_text.text("🏃‍♂️ Creating exercise plan...")
-        progress_bar.progress(80)
-        
-        recommendations = specialist_advisor.get_health_recommendations(medical_data)
-        
-        status_text.text("✅ Recommendations ready!")
-        progress_bar.progress(100)
-        
-        # Clear progress indicators
-        progress_bar.empty()
-        status_text.empty()
+        # One status element covers both the wait and the outcome
+        with st.status("🧠 Generating recommendations...", expanded=False) as status:
+            try:
+                recommendations = pending.result(timeout=RECOMMENDATION_TIMEOUT)
+            except TimeoutError:
+                recommendations = {"error": f"No response from the AI services within {RECOMMENDATION_TIMEOUT} seconds"}
+            
+            if 'error' in recommendations:
+                status.update(label="❌ Recommendations unavailable", state="error")
+            else:
+                status.update(label="✅ Recommendations generated successfully!", state="complete")
         
         if 'error' in recommendations:
             st.error(f"❌ Failed to generate recommendations: {recommendations['error']}")
             return
         
-        st.success("✅ Recommendations generated successfully!")
-        
         # Display Diet Plan
         if 'diet_plan' in recommendations:
             st.write("### 🥗 Diet Plan")
@@ -440,24 +576,10 @@ def generate_recommendations(app: SehatScanApp, medical_data: MedicalData, api_k
             if 'summary' in diet_plan:
                 st.write(f"**Summary:** {diet_plan['summary']}")
             
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                if 'foods_to_include' in diet_plan:
-                    st.write("**Foods to Include:**")
-                    for food in diet_plan['foods_to_include']:
-                        st.write(f"• {food}")
-            
-            with col2:
-                if 'foods_to_avoid' in diet_plan:
-                    st.write("**Foods to Avoid:**")
-                    for food in diet_plan['foods_to_avoid']:
-                        st.write(f"• {food}")
+            render_list_sections(diet_plan, _DIET_SECTIONS)
             
             if 'meal_suggestions' in diet_plan:
-                st.write("**Meal Suggestions:**")
-                for suggestion in diet_plan['meal_suggestions']:
-                    st.write(f"• {suggestion}")
+                render_bullets(diet_plan['meal_suggestions'], "Meal Suggestions")
         
         # Display Exercise Plan
         if 'exercise_plan' in recommendations:
@@ -480,72 +602,29 @@ def generate_recommendations(app: SehatScanApp, medical_data: MedicalData, api_k
                             frequency = rec.get('frequency', 'Not specified')
                             duration = rec.get('duration', 'Not specified')
                             
-                            st.write(f"**{activity}**")
-                            st.write(f"  • Frequency: {frequency}")
-                            st.write(f"  • Duration: {duration}")
-                            st.write("")
+                            st.markdown(f"**{activity}**\n- Frequency: {frequency}\n- Duration: {duration}")
                         else:
-                            st.write(f"• {rec}")
+                            render_bullets([rec])
                 else:
-                    st.write("• Exercise recommendations format error")
+                    render_bullets(["Exercise recommendations format error"])
             
             else:
                 # Complex format with separate cardiovascular and strength training
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    if 'cardiovascular' in exercise_plan:
-                        cardio = exercise_plan['cardiovascular']
-                        st.write("**Cardiovascular Exercise:**")
-                        if 'activities' in cardio:
-                            for activity in cardio['activities']:
-                                st.write(f"• {activity}")
-                        if 'frequency' in cardio:
-                            st.write(f"**Frequency:** {cardio['frequency']}")
-                        if 'duration' in cardio:
-                            st.write(f"**Duration:** {cardio['duration']}")
-                
-                with col2:
-                    if 'strength_training' in exercise_plan:
-                        strength = exercise_plan['strength_training']
-                        st.write("**Strength Training:**")
-                        if 'activities' in strength:
-                            for activity in strength['activities']:
-                                st.write(f"• {activity}")
-                        if 'frequency' in strength:
-                            st.write(f"**Frequency:** {strength['frequency']}")
-                        if 'duration' in strength:
-                            st.write(f"**Duration:** {strength['duration']}")
+                for col, (key, heading) in zip(st.columns(len(_EXERCISE_SECTIONS)), _EXERCISE_SECTIONS):
+                    if (routine := exercise_plan.get(key)) is not None:
+                        with col:
+                            render_bullets(routine.get('activities', []), heading)
+                            for field in ('frequency', 'duration'):
+                                if field in routine:
+                                    st.write(f"**{field.title()}:** {routine[field]}")
                 
                 if 'additional_recommendations' in exercise_plan:
-                    st.write("**Additional Recommendations:**")
-                    for rec in exercise_plan['additional_recommendations']:
-                        st.write(f"• {rec}")
+                    render_bullets(exercise_plan['additional_recommendations'], "Additional Recommendations")
         
         # Display General Recommendations
         if 'general_recommendations' in recommendations:
             st.write("### 📋 General Recommendations")
-            general = recommendations['general_recommendations']
-            
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                if 'lifestyle_changes' in general:
-                    st.write("**Lifestyle Changes:**")
-                    for change in general['lifestyle_changes']:
-                        st.write(f"• {change}")
-            
-            with col2:
-                if 'monitoring' in general:
-                    st.write("**Monitoring:**")
-                    for item in general['monitoring']:
-                        st.write(f"• {item}")
-            
-            with col3:
-                if 'follow_up' in general:
-                    st.write("**Follow-up:**")
-                    for item in general['follow_up']:
-                        st.write(f"• {item}")
+            render_list_sections(recommendations['general_recommendations'], _GENERAL_SECTIONS)
         
         # Display Disclaimer
         if 'disclaimer' in recommendations:
@@ -553,7 +632,7 @@ def generate_recommendations(app: SehatScanApp, medical_data: MedicalData, api_k
         
         # Raw recommendations (expandable)
         with st.expander("🔍 View Raw Recommendations JSON"):
-            st.json(recommendations)
+            st.code(json_dumps_indented(recommendations), language='json')
             
         # Debug info if there are issues
         if 'error' in recommendations:
@@ -571,74 +650,44 @@ def main():
     """Main application function."""
     configure_page()
     
-    # Initialize application
-    app = SehatScanApp()
-    
-    # Render sidebar and get API key
-    api_key = render_sidebar()
+    # Render sidebar and get API keys
+    api_key, gemini_key = render_sidebar()
     
     # Main content
     st.title("🩺 SehatScan")
     st.markdown("**AI-powered medical report analysis that makes your health data clear and accessible.**")
     
+    ocr_available = _ocr_available()
+    
     # Check if running on Streamlit Cloud (OCR not available)
-    if OCR_IMPORT_SUCCESS:
-        try:
-            from src.medical_ocr.ocr_processor import PADDLEOCR_AVAILABLE
-            if not PADDLEOCR_AVAILABLE:
-                st.info(
-                    "ℹ️ **Running in Cloud Mode**: OCR is not available on this platform. "
-                    "Please use the **'Input JSON'** tab to paste your medical data directly. "
-                    "All visualization and AI recommendation features are fully available!"
-                )
-        except:
-            st.info(
-                "ℹ️ **JSON Input Mode**: Use the **'Input JSON'** tab to paste your medical data. "
-                "All visualization and AI recommendation features are available!"
-            )
-    else:
+    if not ocr_available:
         st.info(
-            "ℹ️ **JSON Input Mode**: Use the **'Input JSON'** tab to paste your medical data. "
-            "All visualization and AI recommendation features are available!"
+            "ℹ️ **Running in Cloud Mode**: OCR is not available on this platform. "
+            "Please use the **'Input JSON'** tab to paste your medical data directly. "
+            "All visualization and AI recommendation features are fully available!"
         )
     
     st.markdown("Get instant insights, visual charts, and personalized health recommendations from your medical data.")
     
     # Create tabs for different input methods
     # Check OCR availability to determine tab order and labels
-    if OCR_IMPORT_SUCCESS:
-        try:
-            from src.medical_ocr.ocr_processor import PADDLEOCR_AVAILABLE
-            if PADDLEOCR_AVAILABLE:
-                tab1, tab2 = st.tabs(["📄 Upload Image", "📝 Input JSON"])
-            else:
-                tab1, tab2 = st.tabs(["📝 Input JSON Data", "📄 Upload Image (Not Available)"])
-        except:
-            tab1, tab2 = st.tabs(["📝 Input JSON Data", "📄 Upload Image (Not Available)"])
+    if ocr_available:
+        tab1, tab2 = st.tabs(["📄 Upload Image", "📝 Input JSON"])
     else:
         tab1, tab2 = st.tabs(["📝 Input JSON Data", "📄 Upload Image (Not Available)"])
     
     medical_data = None
     
     # Handle tab content based on OCR availability
-    if OCR_IMPORT_SUCCESS:
-        try:
-            from src.medical_ocr.ocr_processor import PADDLEOCR_AVAILABLE
-            ocr_available = PADDLEOCR_AVAILABLE
-        except:
-            ocr_available = False
-    else:
-        ocr_available = False
-    
     if ocr_available:
         # OCR is available - normal flow
         with tab1:
-            uploaded_image = render_file_upload()
-            if uploaded_image is not None:
+            uploaded_pages = render_file_upload()
+            if uploaded_pages:
                 if st.button("🔍 Process Document", key="process_ocr"):
-                    ocr_processor = app.initialize_ocr()
+                    ocr_processor = initialize_ocr()
                     if ocr_processor is not None:
-                        medical_data = process_medical_document(app, uploaded_image)
+                        medical_data = process_medical_document(uploaded_pages)
                     else:
                         st.error("❌ Cannot process document: OCR not available")
         
@@ -674,6 +723,13 @@ def main():
     
     # Process and display results if we have medical data
     if medical_data is not None:
+        # Start the recommendation request first so its network latency
+        # overlaps with building the table and charts below
+        pending = None
+        specialist_advisor = initialize_specialist_advisor(api_key, gemini_key)
+        if specialist_advisor is not None:
+            pending = request_recommendations(specialist_advisor, medical_data)
+        
         st.markdown("---")
         
         # Display extracted data
@@ -682,12 +738,12 @@ def main():
         st.markdown("---")
         
         # Create visualizations
-        create_visualizations(app, medical_data)
+        create_visualizations(medical_data)
         
         st.markdown("---")
         
         # Generate recommendations
-        generate_recommendations(app, medical_data, api_key)
+        generate_recommendations(api_key, gemini_key, pending)
 
 
 if __name__ == "__main__":
@@ -6,11 +6,17 @@ This module uses the exact same logic as the working MedicalOCR code.
 
 import json
 import logging
+import queue
+import re
 import tempfile
+import threading
+import time
 import os
+from dataclasses import dataclass
 from typing import Any, Optional
 import numpy as np
-from PIL import Image
+
+from ._kernels import line_ids, nearest_header
 
 # Initialize logger first
 logger = logging.getLogger(__name__)
@@ -18,7 +24,7 @@ logger = logging.getLogger(__name__)
 # Python 3.12+ type aliases for better readability
 type MedicalData = dict[str, Any]
 type DetectionList = list[dict[str, Any]]
-type LineGroups = list[list[dict[str, Any]]]
+type LineGroups = list[Detections]
 
 # Try to import PaddleOCR with proper error handling
 try:
@@ -34,6 +40,61 @@ except Exception as e:
     PaddleOCR = None
     logger.warning(f"PaddleOCR import failed: {e}")
 
+# OpenCV ships with the OCR extra; it decodes uploads in memory
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# Marks the end of a stage's output in the batch pipeline
+_PIPELINE_DONE = object()
+
+# Labels for patient and report details, mapped to (category, field)
+KEY_MAP = {
+    "Patient Name": ("patient", "name"),
+    "DOB": ("patient", "dob"),
+    "Sex": ("patient", "sex"),
+    "Report Date": ("report_details", "report_date"),
+    "Specimen": ("report_details", "specimen"),
+    "Accession": ("report_details", "accession"),
+}
+
+# Words marking section headers and other non-data rows inside the results table
+SKIP_WORDS = ("panel", "count", "physician", "laboratory", "complete", "metabolic")
+
+# One compiled scan per token/row instead of a substring test per label or word
+_KEY_PATTERN = re.compile("|".join(map(re.escape, KEY_MAP)))
+_SKIP_PATTERN = re.compile("|".join(map(re.escape, SKIP_WORDS)))
+
+
+@dataclass(slots=True, frozen=True)
+class Detections:
+    """
+    OCR detections for a page or line, stored as one array per field.
+    
+    Attributes:
+        boxes (np.ndarray): (N, 4, 2) float64 box corners, clockwise from top-left
+        texts (list[str]): Recognized text of each box
+        scores (np.ndarray): (N,) recognition confidence of each box
+    """
+    boxes: np.ndarray
+    texts: list[str]
+    scores: np.ndarray
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+    
+    def take(self, indices: np.ndarray) -> "Detections":
+        """Select detections by index, in the given order."""
+        return Detections(self.boxes[indices], [self.texts[i] for i in indices.tolist()], self.scores[indices])
+    
+    def to_legacy_list(self) -> DetectionList:
+        """Convert to the list of {'box', 'text', 'score'} dicts returned by earlier versions."""
+        return [
+            {'box': box, 'text': text, 'score': score}
+            for box, text, score in zip(self.boxes.tolist(), self.texts, self.scores.tolist())
+        ]
+
 
 class MedicalOCRProcessor:
     """
@@ -53,15 +114,25 @@ class MedicalOCRProcessor:
         self.ocr = PaddleOCR(lang=lang, use_angle_cls=use_angle_cls)
         logger.info("Medical OCR Processor initialized")
     
-    def process_image(self, image_input) -> MedicalData:
+    def process_image(self, image_input: bytes | str | np.ndarray) -> MedicalData:
         """
         Process a medical document image using exact same logic as working MedicalOCR.
+        
+        Args:
+            image_input (bytes | str | np.ndarray): Encoded image file contents, an image
+                path, or a decoded BGR (H, W, 3) uint8 array (see process_ndarray for RGB)
+            
+        Returns:
+            MedicalData: Structured medical data
         """
         try:
             logger.info("Starting OCR processing")
             
-            # Handle bytes input by saving to temporary file
-            if isinstance(image_input, bytes):
+            # Decode bytes input in memory; a temporary file is the fallback
+            image = self._decode_bytes(image_input) if isinstance(image_input, bytes) else None
+            if image is not None:
+                result = self.ocr.predict(input=image)
+            elif isinstance(image_input, bytes):
                 with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_file:
                     tmp_file.write(image_input)
                     tmp_path = tmp_file.name
@@ -81,20 +152,7 @@ class MedicalOCRProcessor:
                 raise Exception("No OCR results returned")
             
             # Get first page result (exact same as working code)
-            page_result = result[0]
-            
-            # Extract detections using exact same function
-            detections = self.extract_detections(page_result)
-            
-            if not detections:
-                raise Exception("Could not extract detections")
-            
-            # Group into lines using exact same function
-            lines = self.group_lines(detections)
-            logger.info(f"Grouped {len(detections)} detections into {len(lines)} lines")
-            
-            # Parse into structured form using exact same function
-            structured_data = self.parse_report(lines)
+            structured_data = self._parse_page(result[0])
             
             logger.info("OCR processing completed successfully")
             return structured_data
@@ -103,55 +161,246 @@ class MedicalOCRProcessor:
             logger.error(f"OCR processing failed: {str(e)}")
             raise Exception(f"Failed to process medical document: {str(e)}")
     
-    def extract_detections(self, ocr_result):
-        """Extract data from OCRResult dict. (Exact copy from working MedicalOCR)"""
-        detections = []
+    def process_ndarray(self, arr: np.ndarray) -> MedicalData:
+        """
+        Process an already-decoded RGB page without a PNG encode/decode round-trip.
+        
+        Args:
+            arr (np.ndarray): RGB page as a (H, W, 3) uint8 array
+            
+        Returns:
+            MedicalData: Structured medical data
+        """
+        # PaddleOCR expects BGR arrays, same as cv2.imdecode would produce
+        return self.process_image(np.ascontiguousarray(arr[..., ::-1]))
+    
+    def process_image_batch(
+        self,
+        images: list[bytes] | np.ndarray,
+        batch_size: int = 8,
+        max_wait: float = 0.05,
+    ) -> list[MedicalData]:
+        """
+        Process several pages, batching OCR calls and overlapping them with parsing.
+        
+        Args:
+            images (list[bytes] | np.ndarray): Encoded image files as uploaded, or RGB
+                pages stacked into a (B, H, W, 3) uint8 array
+            batch_size (int): Most pages passed to a single PaddleOCR predict call
+            max_wait (float): Seconds to wait for more pages before predicting a partial batch
+            
+        Returns:
+            list[MedicalData]: Structured data for each page, in input order
+        """
+        try:
+            logger.info(f"Starting batched OCR processing of {len(images)} pages")
+            
+            if isinstance(images, np.ndarray):
+                structured_pages = []
+                for start in range(0, len(images), batch_size):
+                    # PaddleOCR expects BGR arrays, same as cv2.imdecode would produce
+                    batch = list(np.ascontiguousarray(images[start:start + batch_size, ..., ::-1]))
+                    result = self.ocr.predict(input=batch)
+                    if not result or len(result) != len(batch):
+                        raise Exception("No OCR results returned")
+                    structured_pages.extend(self._parse_page(page_result) for page_result in result)
+            else:
+                # Encoded files are decoded, predicted and parsed in overlapping stages
+                structured_pages = self._pipeline_pages(images, batch_size, max_wait)
+            
+            logger.info("Batched OCR processing completed successfully")
+            return structured_pages
+            
+        except Exception as e:
+            logger.error(f"Batched OCR processing failed: {str(e)}")
+            raise Exception(f"Failed to process medical documents: {str(e)}")
+    
+    def process_images(self, images: list[bytes] | np.ndarray, batch_size: int = 8) -> list[MedicalData]:
+        """
+        Process several pages with one PaddleOCR predict call per batch.
+        
+        Alias of process_image_batch.
+        
+        Args:
+            images (list[bytes] | np.ndarray): Encoded image files as uploaded, or RGB
+                pages stacked into a (B, H, W, 3) uint8 array
+            batch_size (int): Most pages passed to a single PaddleOCR predict call
+            
+        Returns:
+            list[MedicalData]: Structured data for each page, in input order
+        """
+        return self.process_image_batch(images, batch_size)
+    
+    def _decode_bytes(self, image_bytes: bytes) -> Optional[np.ndarray]:
+        """Decode an encoded image straight to a BGR array, or None if OpenCV is missing or fails."""
+        if cv2 is None:
+            return None
+        return cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    
+    def _pipeline_pages(self, images: list[bytes], batch_size: int, max_wait: float) -> list[MedicalData]:
+        """
+        Run page decoding, OCR and parsing as three overlapping stages.
+        
+        A decoder thread turns each page into a BGR array (saving it to a temporary
+        file only if OpenCV cannot decode it), a predictor thread groups ready pages
+        into batches of up to batch_size for PaddleOCR, and the calling thread parses
+        each page result while the next batch is being predicted.
+        
+        Args:
+            images (list[bytes]): Encoded image files as uploaded
+            batch_size (int): Most pages passed to a single PaddleOCR predict call
+            max_wait (float): Seconds to wait for more pages before predicting a partial batch
+            
+        Returns:
+            list[MedicalData]: Structured data for each page, in input order
+        """
+        pages_queue = queue.Queue()
+        results_queue = queue.Queue()
+        cancelled = threading.Event()
+        written = []
+        
+        def decode_pages():
+            try:
+                for idx, image_bytes in enumerate(images):
+                    if cancelled.is_set():
+                        break
+                    image = self._decode_bytes(image_bytes)
+                    if image is not None:
+                        pages_queue.put((idx, image))
+                        continue
+                    with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_file:
+                        tmp_file.write(image_bytes)
+                        written.append(tmp_file.name)
+                    pages_queue.put((idx, tmp_file.name))
+            except Exception as e:
+                pages_queue.put(e)
+            finally:
+                pages_queue.put(_PIPELINE_DONE)
+        
+        def predict_batches():
+            try:
+                finished = False
+                while not finished and not cancelled.is_set():
+                    item = pages_queue.get()
+                    if item is _PIPELINE_DONE:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    
+                    # Gather more pages until the batch is full or max_wait runs out
+                    batch = [item]
+                    deadline = time.monotonic() + max_wait
+                    while len(batch) < batch_size:
+                        try:
+                            item = pages_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                        except queue.Empty:
+                            break
+                        if item is _PIPELINE_DONE:
+                            finished = True
+                            break
+                        if isinstance(item, Exception):
+                            raise item
+                        batch.append(item)
+                    
+                    indices, pages = zip(*batch)
+                    result = self.ocr.predict(input=list(pages))
+                    if not result or len(result) != len(pages):
+                        raise Exception("No OCR results returned")
+                    for idx, page_result in zip(indices, result):
+                        results_queue.put((idx, page_result))
+            except Exception as e:
+                results_queue.put(e)
+            finally:
+                results_queue.put(_PIPELINE_DONE)
+        
+        stages = [
+            threading.Thread(target=decode_pages, name="ocr-decoder", daemon=True),
+            threading.Thread(target=predict_batches, name="ocr-predictor", daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+        
+        structured_pages = [None] * len(images)
+        try:
+            while (item := results_queue.get()) is not _PIPELINE_DONE:
+                if isinstance(item, Exception):
+                    raise item
+                idx, page_result = item
+                structured_pages[idx] = self._parse_page(page_result)
+        finally:
+            cancelled.set()
+            for stage in stages:
+                stage.join()
+            # Clean up temporary files
+            for tmp_path in written:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+        
+        if any(page is None for page in structured_pages):
+            raise Exception("No OCR results returned")
+        
+        return structured_pages
+    
+    def _parse_page(self, page_result) -> MedicalData:
+        """Turn a single PaddleOCR page result into structured medical data."""
+        # Extract detections using exact same function
+        detections = self.extract_detections(page_result)
+        
+        if not detections:
+            raise Exception("Could not extract detections")
         
-        texts = ocr_result['rec_texts']
+        # Group into lines using exact same function
+        lines = self.group_lines(detections)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Grouped %d detections into %d lines", len(detections), len(lines))
+        
+        # Parse into structured form using exact same function
+        return self.parse_report(lines)
+    
+    def extract_detections(self, ocr_result) -> Detections:
+        """Extract data from OCRResult dict. (Array port of working MedicalOCR)"""
+        texts = list(ocr_result['rec_texts'])
         boxes = ocr_result['rec_polys']
         scores = ocr_result['rec_scores']
         
-        logger.info(f"Extracted {len(texts)} text items from OCR")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Extracted %d text items from OCR", len(texts))
         
-        for box, text, score in zip(boxes, texts, scores):
-            detections.append({
-                'box': box.tolist() if hasattr(box, 'tolist') else box,
-                'text': text,
-                'score': float(score) if hasattr(score, 'item') else score
-            })
+        if not texts:
+            return Detections(np.empty((0, 4, 2)), [], np.empty(0))
         
-        return detections
+        return Detections(
+            np.stack([np.asarray(box) for box in boxes]).astype(np.float64),
+            texts,
+            np.asarray(scores, dtype=np.float64),
+        )
 
-    def group_lines(self, detections, y_tolerance=15):
-        """Group detections into horizontal lines based on y-coordinate. (Exact copy from working MedicalOCR)"""
+    def group_lines(self, detections: Detections, y_tolerance=15) -> LineGroups:
+        """Group detections into horizontal lines based on y-coordinate. (Vectorized port of working MedicalOCR)"""
         if not detections:
             return []
         
+        # Only the top-left corner and bottom y of each box are needed
+        boxes = detections.boxes
+        left, top, bottom = boxes[:, 0, 0], boxes[:, 0, 1], boxes[:, 2, 1]
+        # Calculate y-center of bounding boxes
+        y_center = (top + bottom) / 2
+        
         # Sort by y (top to bottom), then x (left to right)
-        detections_list = sorted(detections, key=lambda det: (det['box'][0][1], det['box'][0][0]))
+        order = np.lexsort((left, top))
         
-        lines = []
-        current_line = [detections_list[0]]
+        # Start a new line wherever consecutive detections are not on the same horizontal line
+        ids = line_ids(y_center[order], float(y_tolerance))
         
-        for i in range(1, len(detections_list)):
-            # Calculate y-center of bounding boxes
-            prev_y = (current_line[-1]['box'][0][1] + current_line[-1]['box'][2][1]) / 2
-            curr_y = (detections_list[i]['box'][0][1] + detections_list[i]['box'][2][1]) / 2
-            
-            # If on same horizontal line, add to current line
-            if abs(curr_y - prev_y) < y_tolerance:
-                current_line.append(detections_list[i])
-            else:
-                # Sort current line by x-coordinate and save
-                lines.append(sorted(current_line, key=lambda det: det['box'][0][0]))
-                current_line = [detections_list[i]]
+        # Sort each line by x-coordinate (stable, so ties keep their y order)
+        order = order[np.lexsort((left[order], ids))]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(ids)) + 1, [len(order)])).tolist()
         
-        # Don't forget the last line
-        lines.append(sorted(current_line, key=lambda det: det['box'][0][0]))
+        lines = [detections.take(order[start:end]) for start, end in zip(starts[:-1], starts[1:])]
         
         return lines
 
-    def parse_report(self, lines):
+    def parse_report(self, lines: LineGroups) -> MedicalData:
         """Parse grouped lines into structured form data. (Exact copy from working MedicalOCR)"""
         data = {
             "patient": {},
@@ -160,27 +409,20 @@ class MedicalOCRProcessor:
         }
         
         # Extract key-value pairs for patient and report details
-        key_map = {
-            "Patient Name": "patient.name",
-            "DOB": "patient.dob",
-            "Sex": "patient.sex",
-            "Report Date": "report_details.report_date",
-            "Specimen": "report_details.specimen",
-            "Accession": "report_details.accession"
-        }
-
         for line in lines:
-            texts = [det['text'] for det in line]
-            
-            for key, path in key_map.items():
-                for j, txt in enumerate(texts):
-                    if key == txt or key in txt:
-                        # The value is typically the next token on the same line
-                        if j + 1 < len(texts):
-                            value = texts[j + 1]
-                            category, field = path.split('.')
-                            data[category][field] = value
-                            break
+            texts = line.texts
+            
+            # Labels found in each token; most lines have none and are skipped
+            found = [_KEY_PATTERN.findall(txt) for txt in texts]
+            if not any(found):
+                continue
+            
+            for key, (category, field) in KEY_MAP.items():
+                for j, keys in enumerate(found):
+                    # The value is typically the next token on the same line
+                    if key in keys and j + 1 < len(texts):
+                        data[category][field] = texts[j + 1]
+                        break
 
         # Find and extract table data
         table_headers = []
@@ -188,7 +430,7 @@ class MedicalOCRProcessor:
 
         # Locate the table header row
         for i, line in enumerate(lines):
-            texts_lower = [det['text'].lower() for det in line]
+            texts_lower = [text.lower() for text in line.texts]
             line_str = " ".join(texts_lower)
             
             # Look for table headers
@@ -196,19 +438,25 @@ class MedicalOCRProcessor:
                 table_start_line = i + 1
                 
                 # Record each header's text and horizontal position
-                for det in line:
-                    x_center = (det['box'][0][0] + det['box'][1][0]) / 2
-                    table_headers.append((det['text'], x_center))
+                x_centers = ((line.boxes[:, 0, 0] + line.boxes[:, 1, 0]) / 2).tolist()
+                table_headers.extend(zip(line.texts, x_centers))
                 
                 # Sort headers by x position (left to right)
                 table_headers = sorted(table_headers, key=lambda h: h[1])
-                logger.info(f"Found table headers: {[h[0] for h in table_headers]}")
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("Found table headers: %s", [h[0] for h in table_headers])
                 break
 
         # Extract table rows
         if table_start_line != -1 and table_headers:
-            logger.info(f"Processing table rows starting from line {table_start_line}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Processing table rows starting from line %d", table_start_line)
             
+            # Create a clean key name for each column once, not once per cell
+            column_keys = [header_text.lower().replace(" ", "_") for header_text, _ in table_headers]
+            header_x = np.array([x for _, x in table_headers], dtype=np.float64)
+            
+            data_rows = []
             for i in range(table_start_line, len(lines)):
                 row = lines[i]
                 
@@ -217,29 +465,27 @@ class MedicalOCRProcessor:
                     continue
                 
                 # Skip section headers and non-data lines
-                line_str = " ".join([det['text'] for det in row]).lower()
-                skip_words = ["panel", "count", "physician", "laboratory", "complete", "metabolic"]
-                if any(word in line_str for word in skip_words):
+                line_str = " ".join(row.texts).lower()
+                if _SKIP_PATTERN.search(line_str):
                     continue
-
-                # Map each cell to its nearest column header
+                
+                data_rows.append(row)
+            
+            # Map each cell to its nearest column header, for all rows in one pass
+            boxes = np.concatenate([row.boxes for row in data_rows]) if data_rows else np.empty((0, 4, 2))
+            x_centers = (boxes[:, 0, 0] + boxes[:, 1, 0]) / 2
+            nearest = iter(nearest_header(x_centers, header_x).tolist())
+            
+            for row in data_rows:
                 row_data = {}
-                for det in row:
-                    text = det['text']
-                    x_center = (det['box'][0][0] + det['box'][1][0]) / 2
-                    
-                    # Find the closest header by x-coordinate
-                    closest_header = min(table_headers, key=lambda h: abs(h[1] - x_center))
-                    header_text = closest_header[0]
-                    
-                    # Create a clean key name
-                    key_name = header_text.lower().replace(" ", "_")
-                    row_data[key_name] = text
+                for text in row.texts:
+                    row_data[column_keys[next(nearest)]] = text
 
                 # Only add rows that look like valid data (at least 3 columns)
                 if len(row_data) >= 3:
                     data["observations"].append(row_data)
 
-        logger.info(f"Extracted {len(data['observations'])} observation rows")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Extracted %d observation rows", len(data['observations']))
         
         return data
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+Bounded recommendation cache for the Specialist Advisor.
+
+Entries live in an in-memory LRU and, when a cache directory is configured,
+in a small SQLite file so recommendations survive server restarts. Both hold
+at most max_entries reports.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from ._json import _dumps, _loads
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendationCache:
+    """
+    A thread-safe LRU cache keyed by report content hash, with optional SQLite persistence.
+    """
+
+    def __init__(self, max_entries: int = 512, cache_dir: Optional[str] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Most entries kept in memory, and on disk, before the oldest is evicted
+            cache_dir (Optional[str]): Directory for the persistent cache file, or None for memory only
+        """
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if cache_dir:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                self._db = sqlite3.connect(
+                    os.path.join(cache_dir, "recommendations.sqlite3"),
+                    check_same_thread=False,
+                )
+                self._db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+                self._db.commit()
+                logger.info(f"Persistent recommendation cache at {cache_dir}")
+            except (OSError, sqlite3.Error) as e:
+                self._db = None
+                logger.warning(f"Persistent recommendation cache unavailable: {e}")
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up an entry, falling back to the persistent store on a memory miss.
+
+        Args:
+            key (str): Content hash of the report
+
+        Returns:
+            Optional[Any]: Cached value, or None if absent
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+            if self._db is None:
+                return None
+
+            try:
+                row = self._db.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Recommendation cache read failed: {e}")
+                return None
+
+            if row is None:
+                return None
+
+            try:
+                value = _loads(row[0])
+            except ValueError as e:
+                logger.warning(f"Ignoring unreadable recommendation cache entry: {e}")
+                return None
+
+            self._remember(key, value)
+            return value
+
+    def put(self, key: str, value: Any):
+        """
+        Store an entry in memory and, if configured, on disk.
+
+        Args:
+            key (str): Content hash of the report
+            value (Any): JSON-serializable value to cache
+        """
+        with self._lock:
+            self._remember(key, value)
+
+            if self._db is None:
+                return
+
+            try:
+                self._db.execute("INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", (key, _dumps(value)))
+                # REPLACE gives the row a new rowid, so the oldest writes have the lowest rowids
+                self._db.execute(
+                    "DELETE FROM cache WHERE rowid <= (SELECT rowid FROM cache ORDER BY rowid DESC LIMIT 1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Recommendation cache write failed: {e}")
+
+    def _remember(self, key: str, value: Any):
+        """Insert into the in-memory LRU, evicting the oldest entry when full."""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
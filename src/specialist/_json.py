@@ -0,0 +1,28 @@
+"""
+JSON helpers shared by the Specialist Advisor and its recommendation cache.
+
+orjson parses and serializes several times faster than the stdlib json module,
+so it is used when installed.
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(data: Any) -> str:
+    """Serialize data as compact, key-sorted JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS).decode()
+    return json.dumps(data, separators=(',', ':'), sort_keys=True, ensure_ascii=False)
+
+
+def _loads(text: str) -> Any:
+    """Parse JSON text, using orjson when it is installed (errors subclass json.JSONDecodeError)."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
@@ -4,20 +4,110 @@ Specialist Advisor for generating AI-powered medical recommendations.
 This module uses the exact working logic from specilistSuggest.py with optimizations for speed.
 """
 
+import asyncio
 import json
 import logging
 import hashlib
 import os
+import re
+from collections.abc import Iterable
 from typing import Any, Optional
 from huggingface_hub import InferenceClient
 import google.generativeai as genai
 
+from ._cache import RecommendationCache
+from ._json import _dumps, _loads
+
 # Python 3.12+ type aliases
 type MedicalData = dict[str, Any]
 type HealthRecommendations = dict[str, Any]
 
 logger = logging.getLogger(__name__)
 
+# Optional markdown code fence (```json or ```) around model output
+_FENCE_RE = re.compile(r"^\s*(?:```(?:json)?)?\s*(.*?)\s*(?:```)?\s*$", re.DOTALL)
+
+
+def _strip_fence(text: str) -> str:
+    """Remove surrounding whitespace and a markdown code fence from model output."""
+    return _FENCE_RE.match(text).group(1)
+
+
+def _read_json_stream(chunks: Iterable[str]) -> str:
+    """
+    Accumulate streamed model output, stopping as soon as the first JSON object closes.
+    
+    A brace only opens the object when the next non-whitespace character is a quote
+    or a closing brace, so braces in prose before a fenced object are skipped.
+    
+    Args:
+        chunks (Iterable[str]): Text chunks as they arrive from the model
+        
+    Returns:
+        str: The first JSON object, the output from its opening brace if it never
+        closes, or all of the output if no object starts
+    """
+    parts = []
+    offset = 0
+    start = pending = None
+    depth = 0
+    in_string = escaped = False
+    
+    for chunk in chunks:
+        parts.append(chunk)
+        for i, char in enumerate(chunk):
+            if pending is not None:
+                if char.isspace():
+                    continue
+                if char in '"}':
+                    start, depth = pending, 1
+                pending = None
+            
+            if depth == 0:
+                if char == '{':
+                    pending = offset + i
+                continue
+            
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if depth == 0:
+                    # Stop reading; whatever the model sends after the object is ignored
+                    return "".join(parts)[start:offset + i + 1]
+        offset += len(chunk)
+    
+    text = "".join(parts)
+    return text if start is None else text[start:]
+
+
+def _close_stream(stream: Any):
+    """Release a streaming response's connection instead of leaving it to garbage collection."""
+    # Generators and HTTP streams close; gRPC streams cancel
+    for name in ("close", "cancel"):
+        release = getattr(stream, name, None)
+        if callable(release):
+            release()
+            return
+
+
+# Health plan sections requested in a single prompt, as (JSON key, instruction) pairs
+HEALTH_PLAN_SECTIONS = [
+    ("diet_plan", "Suggest specific foods to eat and avoid to address the {findings}."),
+    ("exercise_plan", "Recommend safe and appropriate exercises (e.g., light cardio, strength training)."),
+    ("general_recommendations", "Include lifestyle modifications, monitoring and follow-up suggestions."),
+    ("disclaimer", "Include a clear disclaimer that this is not a substitute for professional medical advice."),
+]
+
 
 class SpecialistAdvisor:
     """
@@ -26,13 +116,21 @@ class SpecialistAdvisor:
     Uses the exact working logic from specilistSuggest.py with speed optimizations.
     """
     
-    def __init__(self, api_key: str, gemini_api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: str,
+        gemini_api_key: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+        cache_max_entries: int = 512,
+    ):
         """
         Initialize the Specialist Advisor.
         
         Args:
             api_key (str): Hugging Face API key for medical model
             gemini_api_key (Optional[str]): Google Gemini API key for JSON formatting
+            cache_dir (Optional[str]): Directory to persist recommendations across restarts
+            cache_max_entries (int): Most reports kept in the in-memory caches
         """
         self.api_key = api_key
         
@@ -42,10 +140,16 @@ class SpecialistAdvisor:
                 provider="featherless-ai",
                 api_key=api_key,
             )
+            # Long-lived formatter client so fallback calls reuse its HTTP connections
+            self.formatter_client = InferenceClient(
+                provider="novita",
+                api_key=api_key,
+            )
             self.hf_available = True
             logger.info("Hugging Face client initialized for medical analysis")
         except Exception as e:
             self.medical_client = None
+            self.formatter_client = None
             self.hf_available = False
             logger.warning(f"Hugging Face client initialization failed: {e}")
         
@@ -73,10 +177,9 @@ class SpecialistAdvisor:
         else:
             logger.info("Both Hugging Face and Gemini available (optimal setup)")
         
-        # Note: Hugging Face formatter client is created fresh when needed (like original code)
-        
-        # Simple in-memory cache for speed
-        self._cache = {}
+        # Bounded LRU caches for speed, recommendations optionally persisted to disk
+        self._cache = RecommendationCache(cache_max_entries, cache_dir)
+        self._findings_cache = RecommendationCache(cache_max_entries)
         
         logger.info("Specialist Advisor initialized with optimized clients and caching")
     
@@ -91,21 +194,22 @@ class SpecialistAdvisor:
             Dict[str, Any]: Structured health recommendations
         """
         try:
-            # Convert medical data to JSON string (same as original)
-            medical_json = json.dumps(medical_data, indent=2)
+            # Compact, key-sorted JSON so equal reports hash (and prompt) identically
+            medical_json = _dumps(medical_data)
             
             # Check cache first for speed
-            cache_key = hashlib.md5(medical_json.encode()).hexdigest()
-            if cache_key in self._cache:
+            cache_key = hashlib.blake2b(medical_json.encode(), digest_size=16).hexdigest()
+            cached = self._cache.get(cache_key)
+            if cached is not None:
                 logger.info("Returning cached health recommendations")
-                return self._cache[cache_key]
+                return cached
             
             # Generate new recommendations
-            result = self._get_health_plan_optimized(medical_json)
+            result = self._get_health_plan_optimized(medical_json, self._findings_for(medical_data, cache_key))
             
             # Cache successful results
             if "error" not in result:
-                self._cache[cache_key] = result
+                self._cache.put(cache_key, result)
                 logger.info("Cached new health recommendations")
             
             return result
@@ -114,25 +218,83 @@ class SpecialistAdvisor:
             logger.error(f"Failed to generate health recommendations: {str(e)}")
             return {"error": f"Failed to generate recommendations: {str(e)}"}
     
-    def _get_health_plan_optimized(self, medical_data: str) -> HealthRecommendations:
+    async def aget_health_recommendations(self, medical_data: MedicalData) -> HealthRecommendations:
+        """
+        Generate health recommendations without blocking the event loop.
+        
+        The AI clients are blocking, so the synchronous pipeline runs in a worker thread.
+        
+        Args:
+            medical_data (Dict[str, Any]): Structured medical data from OCR
+            
+        Returns:
+            Dict[str, Any]: Structured health recommendations
+        """
+        return await asyncio.to_thread(self.get_health_recommendations, medical_data)
+    
+    async def abatch(self, reports: list[MedicalData], max_concurrency: int = 8) -> list[HealthRecommendations]:
+        """
+        Generate recommendations for several reports with overlapping LLM calls.
+        
+        Args:
+            reports (List[Dict[str, Any]]): Structured medical data, one entry per report
+            max_concurrency (int): Most reports with requests in flight at once
+            
+        Returns:
+            List[Dict[str, Any]]: Recommendations for each report, in input order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def generate(medical_data: MedicalData) -> HealthRecommendations:
+            async with semaphore:
+                return await self.aget_health_recommendations(medical_data)
+        
+        return await asyncio.gather(*(generate(medical_data) for medical_data in reports))
+    
+    def _findings_for(self, medical_data: MedicalData, cache_key: str) -> list[str]:
+        """
+        Return the key findings for a report, analyzing each distinct report once.
+        
+        Args:
+            medical_data (Dict[str, Any]): Structured medical data
+            cache_key (str): Content hash of the report
+            
+        Returns:
+            list: List of key findings
+        """
+        findings = self._findings_cache.get(cache_key)
+        if findings is None:
+            findings = self._quick_analyze_findings(medical_data)
+            self._findings_cache.put(cache_key, findings)
+        return findings
+    
+    def _get_health_plan_optimized(self, medical_data: str, findings: list[str]) -> HealthRecommendations:
         """
         Optimized version with Gemini fallback for both medical analysis and formatting.
         
         Args:
             medical_data (str): Medical data in JSON string format
+            findings (list[str]): Key findings used to target the prompt
             
         Returns:
             Dict[str, Any]: Structured health plan
         """
-        # Step 1: Generate health plan text - try Hugging Face first, fallback to Gemini
+        # Step 1: Generate the whole health plan as JSON in one call - try Hugging Face first, fallback to Gemini
         try:
-            health_plan_text = self._generate_health_plan_with_fallback(medical_data)
+            prompt = self._build_health_plan_prompt(medical_data, findings)
+            health_plan_text = self._generate_health_plan_with_fallback(prompt)
             if not health_plan_text:
                 return {"error": "Failed to generate health plan with both services"}
 
         except Exception as e:
             return {"error": f"Failed to generate health plan: {e}"}
 
+        # Most responses already follow the schema, which saves the formatting round-trip
+        structured_plan = self._parse_health_plan_json(health_plan_text)
+        if structured_plan is not None:
+            logger.info("Health plan returned valid JSON, skipping formatting step")
+            return structured_plan
+
         # Step 2: Structure the output using Gemini or Hugging Face fallback
         try:
             return self._format_with_gemini_or_fallback(health_plan_text)
@@ -140,21 +302,25 @@ class SpecialistAdvisor:
         except Exception as e:
             return {"error": f"Failed to format health plan: {e}"}
     
-    def _generate_health_plan_with_fallback(self, medical_data: str) -> str:
+    def _build_health_plan_prompt(self, medical_data: str, findings: list[str]) -> str:
         """
-        Generate health plan using Hugging Face first, then Gemini fallback.
+        Build a single prompt asking for every health plan section as one JSON object.
         
         Args:
             medical_data (str): Medical data in JSON string format
+            findings (list[str]): Key findings used to target the prompt
             
         Returns:
-            str: Generated health plan text
+            str: Health plan prompt
         """
-        # Analyze findings for targeted prompt
-        findings = self._quick_analyze_findings(medical_data)
         findings_text = ", ".join(findings) if findings else "High WBC, High Creatinine, Low Potassium"
         
-        prompt = f"""
+        instructions = "\n".join(
+            f"        {i}. **{key}:** {instruction.format(findings=findings_text.lower())}"
+            for i, (key, instruction) in enumerate(HEALTH_PLAN_SECTIONS, start=1)
+        )
+        
+        return f"""
         Analyze the following medical data. Based on the findings ({findings_text}),
         generate a detailed diet and exercise plan.
 
@@ -164,13 +330,73 @@ class SpecialistAdvisor:
         ```
 
         **Instructions:**
-        1. **Diet Plan:** Suggest specific foods to eat and avoid to address the {findings_text.lower()}.
-        2. **Exercise Plan:** Recommend safe and appropriate exercises (e.g., light cardio, strength training).
-        3. **General Recommendations:** Include lifestyle modifications and monitoring suggestions.
-        4. **Disclaimer:** Include a clear disclaimer that this is not a substitute for professional medical advice.
-        5. **Format:** Use clear headings for each section. Be specific and actionable.
+{instructions}
+
+        **Required JSON Structure (copy this format exactly):**
+        {{
+          "diet_plan": {{
+            "summary": "A brief, one-sentence summary of the dietary goals.",
+            "foods_to_include": ["food1", "food2", "food3"],
+            "foods_to_avoid": ["food1", "food2", "food3"]
+          }},
+          "exercise_plan": {{
+            "summary": "A brief, one-sentence summary of the exercise goals.",
+            "recommendations": [
+              {{
+                "activity": "Walking",
+                "frequency": "Daily",
+                "duration": "30 minutes per session"
+              }}
+            ]
+          }},
+          "general_recommendations": {{
+            "lifestyle_changes": ["change1", "change2"],
+            "monitoring": ["item1", "item2"],
+            "follow_up": ["item1", "item2"]
+          }},
+          "disclaimer": "Information provided is for general use only and not for entire medical diagnosis. In serious conditions, consult a licensed healthcare professional."
+        }}
+
+        Output ONLY valid JSON - no markdown, no explanations, no extra text.
+        Be specific and actionable.
+        """
+    
+    def _parse_health_plan_json(self, health_plan_text: str) -> Optional[dict[str, Any]]:
+        """
+        Parse a health plan that was generated directly as JSON.
+        
+        Args:
+            health_plan_text (str): Raw model output
+            
+        Returns:
+            Optional[Dict[str, Any]]: Structured plan, or None if the output needs formatting
         """
+        # Ignore markdown fences or reasoning text around the outermost object
+        start = health_plan_text.find("{")
+        end = health_plan_text.rfind("}")
+        if start == -1 or end < start:
+            return None
+        
+        try:
+            plan = _loads(health_plan_text[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+        
+        if not isinstance(plan, dict) or not self._validate_json_structure(plan):
+            return None
         
+        return plan
+    
+    def _generate_health_plan_with_fallback(self, prompt: str) -> str:
+        """
+        Generate health plan text using Hugging Face first, then Gemini fallback.
+        
+        Args:
+            prompt (str): Health plan prompt
+            
+        Returns:
+            str: Generated health plan text
+        """
         # Try Hugging Face first
         try:
             logger.info("Trying Hugging Face for medical analysis")
@@ -272,10 +498,17 @@ class SpecialistAdvisor:
                     generation_config=genai.types.GenerationConfig(
                         temperature=0.1,  # Very low for consistent JSON
                         max_output_tokens=1500,
-                    )
+                    ),
+                    stream=True,
                 )
                 
-                json_output_str = response.text
+                stream = iter(response)
+                try:
+                    json_output_str = _read_json_stream(chunk.text for chunk in stream if chunk.parts)
+                finally:
+                    # The reader stops at the closing brace, possibly mid-stream; closing the
+                    # iterator is best-effort, as the client exposes no way to cancel the call
+                    _close_stream(stream)
                 logger.info("Gemini formatting successful")
                 
             except Exception as e:
@@ -287,22 +520,11 @@ class SpecialistAdvisor:
         
         # Clean and parse JSON output
         try:
-            # Clean JSON output more thoroughly
-            json_output_str = json_output_str.strip()
-            
             # Remove markdown formatting
-            if json_output_str.startswith("```json"):
-                json_output_str = json_output_str[7:]
-            elif json_output_str.startswith("```"):
-                json_output_str = json_output_str[3:]
-            
-            if json_output_str.endswith("```"):
-                json_output_str = json_output_str[:-3]
-            
-            json_output_str = json_output_str.strip()
+            json_output_str = _strip_fence(json_output_str)
             
             # Try to parse JSON
-            final_json = json.loads(json_output_str)
+            final_json = _loads(json_output_str)
             
             # Validate required structure
             if not self._validate_json_structure(final_json):
@@ -335,24 +557,24 @@ class SpecialistAdvisor:
         try:
             logger.info("Using Hugging Face DeepSeek for JSON formatting")
             
-            # Create fresh client like in original code
-            formatter_client = InferenceClient(
-                provider="novita",
-                api_key=self.api_key,
-            )
-            
-            completion = formatter_client.chat.completions.create(
+            completion = self.formatter_client.chat.completions.create(
                 model="deepseek-ai/DeepSeek-V3.2-Exp",
                 messages=[{"role": "user", "content": prompt}],
+                stream=True,
             )
 
-            json_output_str = completion.choices[0].message.content
+            try:
+                json_output_str = _read_json_stream(
+                    chunk.choices[0].delta.content or "" for chunk in completion if chunk.choices
+                )
+            finally:
+                # The reader stops at the closing brace, possibly mid-stream
+                _close_stream(completion)
 
-            # Clean JSON output (exact same logic as original)
-            if json_output_str.strip().startswith("```json"):
-                json_output_str = json_output_str.strip()[7:-3]
+            # Remove markdown formatting
+            json_output_str = _strip_fence(json_output_str)
 
-            final_json = json.loads(json_output_str)
+            final_json = _loads(json_output_str)
             logger.info("Successfully generated health recommendations with Hugging Face")
             return final_json
 
@@ -366,12 +588,12 @@ class SpecialistAdvisor:
             logger.error(f"Hugging Face formatting error: {str(e)}")
             return {"error": f"Failed to get response from formatting model: {e}"}
     
-    def _quick_analyze_findings(self, medical_data_str: str) -> list:
+    def _quick_analyze_findings(self, medical_data: MedicalData) -> list:
         """
         Quick analysis of medical findings for targeted prompts.
         
         Args:
-            medical_data_str (str): Medical data JSON string
+            medical_data (Dict[str, Any]): Structured medical data
             
         Returns:
             list: List of key findings
@@ -379,7 +601,6 @@ class SpecialistAdvisor:
         findings = []
         
         try:
-            medical_data = json.loads(medical_data_str)
             observations = medical_data.get('observations', [])
             
             for obs in observations:
@@ -0,0 +1,26 @@
+"""
+Numeric kernels used by the Medical Data Visualizer.
+
+These are short vectorized NumPy expressions over one report's observations,
+so unlike the OCR kernels they are not compiled with Numba: a JIT compile on
+a cold start would cost more than it could save.
+"""
+
+import numpy as np
+
+
+def score_observations(values: np.ndarray, lows: np.ndarray, highs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute gauge geometry for every observation in a single pass.
+
+    Args:
+        values (np.ndarray): Numeric test results (NaN if unparseable)
+        lows (np.ndarray): Reference range minimums (NaN if unparseable)
+        highs (np.ndarray): Reference range maximums (NaN if unparseable)
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Delta reference (range midpoint) and gauge axis maximum
+    """
+    references = (lows + highs) / 2
+    axis_max = np.maximum(highs * 1.2, values * 1.2)
+    return references, axis_max
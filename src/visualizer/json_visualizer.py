@@ -5,21 +5,109 @@ This module provides functionality to create various types of visualizations
 for medical test results and patient data.
 """
 
+import copy
+import functools
+import hashlib
 import json
 import logging
-from typing import Any, Optional
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from typing import Any, Literal, Optional
 import plotly.graph_objects as go
 import plotly.express as px
+import plotly.io as pio
 import pandas as pd
 import numpy as np
 
+from ._kernels import score_observations
+
 # Python 3.12+ type aliases
 type MedicalData = dict[str, Any]
 type ObservationList = list[dict[str, Any]]
 type VisualizationDict = dict[str, go.Figure]
+type SerializedVisualizations = dict[str, str]
+type ObservationFrame = pd.DataFrame
 
 logger = logging.getLogger(__name__)
 
+# Test result flags mapped to (display name, chart color)
+_FLAG_TABLE = {
+    'N': ('Normal', '#28a745'),  # Green for normal
+    'H': ('High', '#dc3545'),  # Red for high
+    'L': ('Low', '#ffc107'),  # Yellow for low
+    'C': ('Critical', '#17a2b8'),  # Blue for critical
+}
+_UNKNOWN_FLAG = ('Unknown', '#6c757d')  # Gray for unknown
+
+
+# Gauge figure spec shared by every test; per-test fields are None until filled in
+_GAUGE_TEMPLATE = {
+    'data': [{
+        'type': 'indicator',
+        'mode': "gauge+number+delta",
+        'value': None,
+        'domain': {'x': [0, 1], 'y': [0, 1]},
+        'title': {'text': None},
+        'delta': {'reference': None},
+        'gauge': {
+            'axis': {'range': [None, None]},
+            'bar': {'color': None},
+            'steps': [
+                {'range': [0, None], 'color': "lightgray"},
+                {'range': [None, None], 'color': "lightgreen"},
+                {'range': [None, None], 'color': "lightgray"}
+            ],
+            'threshold': {
+                'line': {'color': "red", 'width': 4},
+                'thickness': 0.75,
+                'value': None
+            }
+        }
+    }],
+    'layout': {
+        'height': 300,
+        'margin': {'l': 20, 'r': 20, 't': 60, 'b': 20},
+        'font': {'size': 12}
+    },
+}
+
+
+@functools.lru_cache(maxsize=512)
+def _build_gauge_cached(
+    test_name: str,
+    unit: str,
+    color: str,
+    numeric_result: float,
+    range_min: float,
+    range_max: float,
+    reference: float,
+    axis_max: float,
+) -> dict[str, Any]:
+    """
+    Build a gauge chart spec, memoized so reruns with the same test skip building it.
+    
+    Returns:
+        Dict[str, Any]: Figure spec for go.Figure, which validates it and applies the
+        default template; callers must not modify it
+    """
+    spec = copy.deepcopy(_GAUGE_TEMPLATE)
+    
+    indicator = spec['data'][0]
+    indicator['value'] = numeric_result
+    indicator['title']['text'] = f"{test_name}<br><span style='font-size:0.8em;color:gray'>{unit}</span>"
+    indicator['delta']['reference'] = reference
+    
+    gauge = indicator['gauge']
+    gauge['axis']['range'][1] = axis_max
+    gauge['bar']['color'] = color
+    gauge['steps'][0]['range'][1] = range_min
+    gauge['steps'][1]['range'] = [range_min, range_max]
+    gauge['steps'][2]['range'] = [range_max, axis_max]
+    gauge['threshold']['value'] = numeric_result
+    
+    return spec
+
 
 class MedicalDataVisualizer:
     """
@@ -29,123 +117,188 @@ class MedicalDataVisualizer:
     bar charts, and trend analysis for medical test results.
     """
     
-    def __init__(self):
-        """Initialize the Medical Data Visualizer."""
+    def __init__(self, cache_size: int = 4):
+        """
+        Initialize the Medical Data Visualizer.
+        
+        Args:
+            cache_size (int): Most reports whose figures (or their JSON) are kept for repeat renders
+        """
+        self.cache_size = cache_size
+        self._viz_cache: OrderedDict[tuple[str, bytes], VisualizationDict | SerializedVisualizations] = OrderedDict()
+        self._viz_lock = threading.Lock()
         logger.info("Medical Data Visualizer initialized")
     
-    def create_visualizations(self, medical_data: MedicalData) -> VisualizationDict:
+    def create_visualizations(
+        self,
+        medical_data: MedicalData,
+        output: Literal['figure', 'json'] = 'figure',
+    ) -> VisualizationDict | SerializedVisualizations:
         """
         Create comprehensive visualizations from medical data.
         
+        Figures for the last few distinct reports are cached by content hash and
+        shared between calls, so callers must not modify the returned figures.
+        
         Args:
             medical_data (Dict[str, Any]): Structured medical data
+            output (str): "figure" for go.Figure objects, or "json" for serialized
+                Plotly JSON strings, cached by report content so repeat renders skip
+                both figure building and serialization
             
         Returns:
-            Dict[str, go.Figure]: Dictionary of visualization figures
+            Dict[str, go.Figure] | Dict[str, str]: Dictionary of visualization figures or their JSON
         """
         try:
-            visualizations = {}
-            
-            if 'observations' not in medical_data or not medical_data['observations']:
-                logger.warning("No observations found in medical data")
-                return visualizations
+            payload = json.dumps(medical_data, sort_keys=True, default=str)
+            key = (output, hashlib.blake2b(payload.encode(), digest_size=16).digest())
             
-            observations = medical_data['observations']
+            with self._viz_lock:
+                cached = self._viz_cache.get(key)
+                if cached is not None:
+                    self._viz_cache.move_to_end(key)
             
-            # Create individual test visualizations
-            for i, obs in enumerate(observations):
-                test_name = obs.get('test_name', f'Test_{i+1}')
+            if cached is None:
+                if output == 'json':
+                    cached = {
+                        name: pio.to_json(fig, validate=False)
+                        for name, fig in self.iter_visualizations(medical_data)
+                    }
+                else:
+                    cached = dict(self.iter_visualizations(medical_data))
                 
-                # Create gauge chart for each test
-                gauge_fig = self._create_gauge_chart(obs)
-                if gauge_fig:
-                    visualizations[f"{test_name}_gauge"] = gauge_fig
+                with self._viz_lock:
+                    self._viz_cache[key] = cached
+                    if len(self._viz_cache) > self.cache_size:
+                        self._viz_cache.popitem(last=False)
             
-            # Create overview charts
-            overview_charts = self._create_overview_charts(observations)
-            visualizations.update(overview_charts)
+            visualizations = dict(cached)
             
-            logger.info(f"Created {len(visualizations)} visualizations")
+            logger.info("Created %d visualizations", len(visualizations))
             return visualizations
             
         except Exception as e:
-            logger.error(f"Failed to create visualizations: {str(e)}")
+            logger.error("Failed to create visualizations: %s", e)
             return {}
     
-    def _create_gauge_chart(self, observation: dict[str, Any]) -> Optional[go.Figure]:
+    def iter_visualizations(self, medical_data: MedicalData) -> Iterator[tuple[str, go.Figure]]:
+        """
+        Yield visualizations one at a time so callers can render them as they are built.
+        
+        Gauge charts come first (keys ending in "_gauge"), followed by the overview charts.
+        
+        Args:
+            medical_data (Dict[str, Any]): Structured medical data
+            
+        Yields:
+            Tuple[str, go.Figure]: Visualization name and figure
+        """
+        if 'observations' not in medical_data or not medical_data['observations']:
+            logger.warning("No observations found in medical data")
+            return
+        
+        # Observations are normalized once and shared by the gauge and overview charts
+        frame = self._normalize(medical_data['observations'])
+        
+        # Gauge geometry for all tests is computed in one kernel call
+        references, axis_max = score_observations(
+            frame['value'].to_numpy(), frame['low'].to_numpy(), frame['high'].to_numpy()
+        )
+        
+        # Create individual test visualizations
+        for i, row in enumerate(frame.itertuples(index=False)):
+            test_name = f'Test_{i+1}' if pd.isna(row.test_name) else row.test_name
+            
+            # Create gauge chart for each test
+            gauge_fig = self._create_gauge_chart(row, references[i], axis_max[i])
+            if gauge_fig:
+                yield f"{test_name}_gauge", gauge_fig
+        
+        # Create overview charts
+        yield from self._create_overview_charts(frame).items()
+    
+    def _normalize(self, observations: ObservationList) -> ObservationFrame:
+        """
+        Convert the observation records into one frame with every field the charts read.
+        
+        Args:
+            observations (List[Dict[str, Any]]): List of all test observations
+            
+        Returns:
+            pd.DataFrame: One row per observation with columns "test_name" (None if missing),
+            "result" and "reference_range" (raw, for log messages), "unit", "flag" (upper-cased),
+            "flag_name", "color", and float64 "value", "low" and "high" (NaN if unparseable)
+        """
+        # Defaults fill only absent keys; explicit nulls stay null, so "result": null
+        # is skipped like any unparseable result instead of being drawn as 0
+        frame = pd.DataFrame({
+            'test_name': [obs.get('test_name') for obs in observations],
+            'result': [obs.get('result', '0') for obs in observations],
+            'reference_range': [obs.get('reference_range', '') for obs in observations],
+            'unit': [obs.get('unit', '') for obs in observations],
+            'flag': [obs.get('flag', 'N') for obs in observations],
+        }, dtype=object)
+        
+        # NaN marks unusable results, so a literal "nan" result is dropped along with
+        # the unparseable ones rather than drawn as an empty gauge
+        values = np.full(len(frame), np.nan)
+        for i, result in enumerate(frame['result'].tolist()):
+            try:
+                values[i] = float(result)
+            except (ValueError, TypeError):
+                pass
+        frame['value'] = values
+        
+        # All reference ranges are parsed together
+        frame['low'], frame['high'] = self._parse_reference_ranges_batch(frame['reference_range'].tolist())
+        
+        # Flags are upper-cased once; anything that is not a string falls through to Unknown
+        flags = [flag.upper() if isinstance(flag, str) else '' for flag in frame['flag'].tolist()]
+        flag_info = [_FLAG_TABLE.get(flag, _UNKNOWN_FLAG) for flag in flags]
+        frame['flag'] = flags
+        frame['flag_name'] = [name for name, _ in flag_info]
+        frame['color'] = [color for _, color in flag_info]
+        
+        return frame
+    
+    def _create_gauge_chart(self, row: Any, reference: float, axis_max: float) -> Optional[go.Figure]:
         """
         Create a gauge chart for a single test observation.
         
         Args:
-            observation (Dict[str, Any]): Single test observation data
+            row (Any): Row of the frame from _normalize, as yielded by itertuples
+            reference (float): Delta reference from score_observations
+            axis_max (float): Gauge axis maximum from score_observations
             
         Returns:
             Optional[go.Figure]: Gauge chart figure or None if creation fails
         """
         try:
-            test_name = observation.get('test_name', 'Unknown Test')
-            result = observation.get('result', '0')
-            unit = observation.get('unit', '')
-            reference_range = observation.get('reference_range', '')
-            flag = observation.get('flag', 'N')
+            test_name = 'Unknown Test' if pd.isna(row.test_name) else row.test_name
             
-            # Parse numeric result
-            try:
-                numeric_result = float(result)
-            except (ValueError, TypeError):
-                logger.warning(f"Could not parse numeric result for {test_name}: {result}")
+            if np.isnan(row.value):
+                logger.warning("Could not parse numeric result for %s: %s", test_name, row.result)
                 return None
             
-            # Parse reference range
-            range_min, range_max = self._parse_reference_range(reference_range)
-            if range_min is None or range_max is None:
-                logger.warning(f"Could not parse reference range for {test_name}: {reference_range}")
+            if np.isnan(row.low) or np.isnan(row.high):
+                logger.warning("Could not parse reference range for %s: %s", test_name, row.reference_range)
                 return None
             
-            # Determine gauge color based on flag
-            color = self._get_flag_color(flag)
-            
-            # Create gauge chart
-            fig = go.Figure(go.Indicator(
-                mode="gauge+number+delta",
-                value=numeric_result,
-                domain={'x': [0, 1], 'y': [0, 1]},
-                title={'text': f"{test_name}<br><span style='font-size:0.8em;color:gray'>{unit}</span>"},
-                delta={'reference': (range_min + range_max) / 2},
-                gauge={
-                    'axis': {'range': [None, max(range_max * 1.2, numeric_result * 1.2)]},
-                    'bar': {'color': color},
-                    'steps': [
-                        {'range': [0, range_min], 'color': "lightgray"},
-                        {'range': [range_min, range_max], 'color': "lightgreen"},
-                        {'range': [range_max, max(range_max * 1.2, numeric_result * 1.2)], 'color': "lightgray"}
-                    ],
-                    'threshold': {
-                        'line': {'color': "red", 'width': 4},
-                        'thickness': 0.75,
-                        'value': numeric_result
-                    }
-                }
+            return go.Figure(_build_gauge_cached(
+                test_name, row.unit, row.color, float(row.value),
+                float(row.low), float(row.high), float(reference), float(axis_max),
             ))
             
-            fig.update_layout(
-                height=300,
-                margin=dict(l=20, r=20, t=60, b=20),
-                font={'size': 12}
-            )
-            
-            return fig
-            
         except Exception as e:
-            logger.error(f"Failed to create gauge chart: {str(e)}")
+            logger.error("Failed to create gauge chart: %s", e)
             return None
     
-    def _create_overview_charts(self, observations: ObservationList) -> VisualizationDict:
+    def _create_overview_charts(self, frame: ObservationFrame) -> VisualizationDict:
         """
         Create overview charts for all observations.
         
         Args:
-            observations (List[Dict[str, Any]]): List of all test observations
+            frame (pd.DataFrame): Normalized observations from _normalize
             
         Returns:
             Dict[str, go.Figure]: Dictionary of overview chart figures
@@ -153,39 +306,26 @@ class MedicalDataVisualizer:
         charts = {}
         
         try:
-            # Prepare data for overview charts
-            test_names = []
-            results = []
-            flags = []
-            units = []
-            
-            for obs in observations:
-                test_name = obs.get('test_name', 'Unknown')
-                result = obs.get('result', '0')
-                flag = obs.get('flag', 'N')
-                unit = obs.get('unit', '')
-                
-                try:
-                    numeric_result = float(result)
-                    test_names.append(test_name)
-                    results.append(numeric_result)
-                    flags.append(flag)
-                    units.append(unit)
-                except (ValueError, TypeError):
-                    continue
-            
-            if not test_names:
+            # Keep only observations with a numeric result (NaN marks the rest)
+            valid = frame['value'].notna().to_numpy()
+            if not valid.any():
                 return charts
             
+            # Prepare data for overview charts, one column at a time
+            table = frame[valid]
+            test_names = table['test_name'].fillna('Unknown').tolist()
+            results = table['value'].to_numpy()
+            units = table['unit'].tolist()
+            colors = table['color'].tolist()
+            
             # Create bar chart of all results
-            colors = [self._get_flag_color(flag) for flag in flags]
             
             bar_fig = go.Figure(data=[
                 go.Bar(
                     x=test_names,
-                    y=results,
+                    y=results,  # float64 array, sent to the browser as a typed array
                     marker_color=colors,
-                    text=[f"{result} {unit}" for result, unit in zip(results, units)],
+                    text=[f"{result} {unit}" for result, unit in zip(results.tolist(), units)],
                     textposition='auto',
                 )
             ])
@@ -201,19 +341,21 @@ class MedicalDataVisualizer:
             
             charts['overview_bar'] = bar_fig
             
-            # Create flag distribution pie chart
-            flag_counts = {}
-            for flag in flags:
-                flag_name = self._get_flag_name(flag)
-                flag_counts[flag_name] = flag_counts.get(flag_name, 0) + 1
-            
-            if len(flag_counts) > 1:
+            # Create flag distribution pie chart, unless every result has the same flag
+            if table['flag_name'].nunique() > 1:
+                flag_names = np.array(table['flag_name'].tolist())
+                labels, first_seen, counts = np.unique(flag_names, return_index=True, return_counts=True)
+                # Slices keep the order in which each flag first appears
+                order = np.argsort(first_seen)
+                labels, counts = labels[order].tolist(), counts[order].tolist()
+                slice_colors = [colors[i] for i in first_seen[order].tolist()]
+                
                 pie_fig = go.Figure(data=[
                     go.Pie(
-                        labels=list(flag_counts.keys()),
-                        values=list(flag_counts.values()),
+                        labels=labels,
+                        values=counts,
                         hole=0.3,
-                        marker_colors=[self._get_flag_color(self._get_flag_code(name)) for name in flag_counts.keys()]
+                        marker_colors=slice_colors
                     )
                 ])
                 
@@ -226,7 +368,7 @@ class MedicalDataVisualizer:
                 charts['flag_distribution'] = pie_fig
             
         except Exception as e:
-            logger.error(f"Failed to create overview charts: {str(e)}")
+            logger.error("Failed to create overview charts: %s", e)
         
         return charts
     
@@ -240,17 +382,43 @@ class MedicalDataVisualizer:
         Returns:
             Tuple[Optional[float], Optional[float]]: Min and max values or (None, None)
         """
-        try:
-            if '-' in reference_range:
-                parts = reference_range.split('-')
-                if len(parts) == 2:
-                    range_min = float(parts[0].strip())
-                    range_max = float(parts[1].strip())
-                    return range_min, range_max
-        except (ValueError, AttributeError):
-            pass
+        lows, highs = self._parse_reference_ranges_batch([reference_range])
+        if np.isnan(lows[0]) or np.isnan(highs[0]):
+            return None, None
         
-        return None, None
+        return float(lows[0]), float(highs[0])
+    
+    def _parse_reference_ranges_batch(self, reference_ranges: list[Any]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Parse many reference range strings into min and max arrays in one pass.
+        
+        A range is two numbers separated by exactly one hyphen (e.g., "12.0-16.0"),
+        so negative bounds such as "-2-3" are not parsed.
+        
+        Args:
+            reference_ranges (List[Any]): Reference range strings; non-strings never parse
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Min and max float64 arrays, both NaN where unparseable
+        """
+        # A plain split/float loop beats both pandas str.extract and Numba here:
+        # the work is string handling, which neither can do without Python objects
+        lows = np.full(len(reference_ranges), np.nan)
+        highs = np.full(len(reference_ranges), np.nan)
+        
+        for i, reference_range in enumerate(reference_ranges):
+            if not isinstance(reference_range, str):
+                continue
+            parts = reference_range.split('-')
+            if len(parts) == 2:
+                try:
+                    lows[i], highs[i] = float(parts[0]), float(parts[1])
+                except ValueError:
+                    pass
+        
+        # A range with one unparseable bound is unparseable as a whole
+        invalid = np.isnan(lows) | np.isnan(highs)
+        return np.where(invalid, np.nan, lows), np.where(invalid, np.nan, highs)
     
     def _get_flag_color(self, flag: str) -> str:
         """
@@ -262,13 +430,7 @@ class MedicalDataVisualizer:
         Returns:
             str: Color string
         """
-        flag_colors = {
-            'N': '#28a745',  # Green for normal
-            'H': '#dc3545',  # Red for high
-            'L': '#ffc107',  # Yellow for low
-            'C': '#17a2b8',  # Blue for critical
-        }
-        return flag_colors.get(flag.upper(), '#6c757d')  # Gray for unknown
+        return _FLAG_TABLE.get(flag.upper(), _UNKNOWN_FLAG)[1]
     
     def _get_flag_name(self, flag: str) -> str:
         """
@@ -280,28 +442,4 @@ class MedicalDataVisualizer:
         Returns:
             str: Human-readable flag name
         """
-        flag_names = {
-            'N': 'Normal',
-            'H': 'High',
-            'L': 'Low',
-            'C': 'Critical'
-        }
-        return flag_names.get(flag.upper(), 'Unknown')
-    
-    def _get_flag_code(self, flag_name: str) -> str:
-        """
-        Get flag code from human-readable name.
-        
-        Args:
-            flag_name (str): Human-readable flag name
-            
-        Returns:
-            str: Flag code
-        """
-        name_to_code = {
-            'Normal': 'N',
-            'High': 'H',
-            'Low': 'L',
-            'Critical': 'C'
-        }
-        return name_to_code.get(flag_name, 'N')
\ No newline at end of file
+        return _FLAG_TABLE.get(flag.upper(), _UNKNOWN_FLAG)[0]
@@ -0,0 +1,72 @@
+"""Tests for the Streamlit app, run headless through Streamlit's AppTest."""
+
+import json
+import pathlib
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = str(pathlib.Path(__file__).resolve().parent.parent / "app.py")
+
+# Lab output routinely mixes numbers and text in one column
+MIXED_REPORT = {
+    "patient": {"name": "Jane Doe"},
+    "observations": [
+        {"test_name": "Hemoglobin", "result": 13.5, "unit": "g/dL", "reference_range": "12.0-16.0", "flag": "N"},
+        {"test_name": "CRP", "result": "<5", "unit": 1, "reference_range": "0-5", "flag": "N"},
+    ],
+}
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """App with no API keys, so no recommendation requests leave the test."""
+    monkeypatch.setenv("HUGGINGFACE_API_KEY", "")
+    monkeypatch.setenv("GEMINI_API_KEY", "")
+    return AppTest.from_file(APP_PATH, default_timeout=60)
+
+
+def test_mixed_type_results_render(app):
+    app.run()
+    app.text_area[0].input(json.dumps(MIXED_REPORT)).run()
+    
+    assert not app.exception
+    assert len(app.dataframe) == 1
+    # Hemoglobin gauge and the bar overview; "<5" has no gauge and one flag has no pie
+    assert len(app.get("plotly_chart")) == 2
+
+
+def recommendation_script():
+    """Request recommendations for the report named in session state with a counting advisor."""
+    import streamlit as st
+    from app import request_recommendations
+    
+    class Advisor:
+        def __init__(self):
+            self.calls = 0
+        
+        def get_health_recommendations(self, medical_data):
+            self.calls += 1
+            return {"diet_plan": {}}
+    
+    advisor = st.session_state.setdefault("advisor", Advisor())
+    report = {"observations": [{"test_name": st.session_state.setdefault("test_name", "Glucose")}]}
+    future = request_recommendations(advisor, report)
+    future.result()
+    st.session_state["futures"] = st.session_state.get("futures", []) + [future]
+
+
+def test_reruns_reuse_the_recommendation_request():
+    app = AppTest.from_function(recommendation_script, default_timeout=60)
+    app.run()
+    app.run()
+    
+    first, second = app.session_state["futures"]
+    assert first is second
+    assert app.session_state["advisor"].calls == 1
+    
+    # A different report gets its own request
+    app.session_state["test_name"] = "Potassium"
+    app.run()
+    assert app.session_state["futures"][2] is not first
+    assert app.session_state["advisor"].calls == 2
@@ -0,0 +1,43 @@
+"""Tests for the bounded recommendation cache."""
+
+import sqlite3
+
+from src.specialist._cache import RecommendationCache
+
+
+def test_memory_evicts_least_recently_used():
+    cache = RecommendationCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_entries_persist_across_instances(tmp_path):
+    RecommendationCache(cache_dir=str(tmp_path)).put("report", {"diet_plan": {"summary": "Less salt"}})
+    
+    assert RecommendationCache(cache_dir=str(tmp_path)).get("report") == {"diet_plan": {"summary": "Less salt"}}
+
+
+def test_disk_keeps_most_recent_entries(tmp_path):
+    cache = RecommendationCache(max_entries=2, cache_dir=str(tmp_path))
+    for key in ("a", "b", "c"):
+        cache.put(key, key)
+    # Rewriting an entry makes it the newest
+    cache.put("b", "b2")
+    cache.put("d", "d")
+    
+    rows = sqlite3.connect(tmp_path / "recommendations.sqlite3").execute("SELECT key FROM cache ORDER BY key").fetchall()
+    assert rows == [("b",), ("d",)]
+
+
+def test_unreadable_row_is_a_miss(tmp_path):
+    cache = RecommendationCache(cache_dir=str(tmp_path))
+    cache._db.execute("INSERT INTO cache (key, value) VALUES ('bad', '{not json')")
+    cache._db.commit()
+    
+    assert cache.get("bad") is None
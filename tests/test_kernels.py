@@ -0,0 +1,70 @@
+"""Tests that the Numba kernels and their NumPy fallbacks agree."""
+
+import importlib.util
+import sys
+
+import numpy as np
+import pytest
+
+from src.medical_ocr import _kernels as ocr_kernels
+from src.visualizer._kernels import score_observations
+
+
+@pytest.fixture
+def numpy_kernels():
+    """The OCR kernels module as loaded without Numba installed."""
+    spec = importlib.util.spec_from_file_location("numpy_ocr_kernels", ocr_kernels.__file__)
+    module = importlib.util.module_from_spec(spec)
+    # Numba is hidden only while the module picks its kernels; compiled ones still need it later
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setitem(sys.modules, "numba", None)
+        spec.loader.exec_module(module)
+    assert not module.NUMBA_AVAILABLE
+    return module
+
+
+@pytest.fixture
+def numba_kernels():
+    pytest.importorskip("numba")
+    assert ocr_kernels.NUMBA_AVAILABLE
+    return ocr_kernels
+
+
+def test_line_ids_match(numba_kernels, numpy_kernels):
+    rng = np.random.default_rng(0)
+    for size in (1, 2, 50):
+        # Whole-pixel centers so gaps land exactly on the tolerance too
+        y_center = np.cumsum(rng.integers(0, 30, size)).astype(np.float64)
+        np.testing.assert_array_equal(
+            numba_kernels.line_ids(y_center, 10.0), numpy_kernels.line_ids(y_center, 10.0)
+        )
+    
+    np.testing.assert_array_equal(numpy_kernels.line_ids(np.array([0.0, 5.0, 15.0, 16.0]), 10.0), [0, 0, 1, 1])
+
+
+def test_nearest_header_match(numba_kernels, numpy_kernels):
+    rng = np.random.default_rng(1)
+    for header_x in (
+        np.array([100.0]),
+        np.array([100.0, 200.0]),
+        np.array([100.0, 100.0, 250.0, 400.0, 400.0]),
+        np.sort(rng.integers(0, 1000, 12)).astype(np.float64),
+    ):
+        # Include the exact midpoints between headers, where ties go left
+        midpoints = (header_x[:-1] + header_x[1:]) / 2
+        x_centers = np.concatenate([rng.uniform(-100, 1100, 200), midpoints, header_x])
+        np.testing.assert_array_equal(
+            numba_kernels.nearest_header(x_centers, header_x), numpy_kernels.nearest_header(x_centers, header_x)
+        )
+    
+    header_x = np.array([100.0, 100.0, 200.0])
+    np.testing.assert_array_equal(numpy_kernels.nearest_header(np.array([90.0, 150.0, 151.0]), header_x), [0, 0, 2])
+
+
+def test_score_observations():
+    references, axis_max = score_observations(
+        np.array([13.5, 150.0, np.nan]), np.array([12.0, 70.0, 1.0]), np.array([16.0, 99.0, 3.0])
+    )
+    
+    np.testing.assert_allclose(references, [14.0, 84.5, 2.0])
+    np.testing.assert_allclose(axis_max, [16.0 * 1.2, 150.0 * 1.2, np.nan])
@@ -0,0 +1,27 @@
+"""Tests for the OCR processor, with PaddleOCR replaced by a stub."""
+
+import numpy as np
+
+from src.medical_ocr.ocr_processor import MedicalOCRProcessor
+
+
+class StubOCR:
+    """Records the number of pages in each predict call and returns one text box per page."""
+    
+    def __init__(self):
+        self.batch_sizes = []
+    
+    def predict(self, input):
+        self.batch_sizes.append(len(input))
+        box = [[0, 0], [40, 0], [40, 10], [0, 10]]
+        return [{'rec_texts': ["Glucose"], 'rec_polys': [box], 'rec_scores': [0.9]} for _ in input]
+
+
+def test_array_pages_are_predicted_in_batches():
+    processor = object.__new__(MedicalOCRProcessor)
+    processor.ocr = StubOCR()
+    
+    pages = processor.process_images(np.zeros((10, 8, 8, 3), dtype=np.uint8), batch_size=4)
+    
+    assert processor.ocr.batch_sizes == [4, 4, 2]
+    assert len(pages) == 10
@@ -0,0 +1,107 @@
+"""Tests for the specialist advisor, with the AI clients stubbed out."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.specialist import SpecialistAdvisor
+from src.specialist.specialist_advisor import _read_json_stream
+
+PLAN = {"diet_plan": {}, "exercise_plan": {}, "disclaimer": "Not medical advice."}
+REPORT = {"observations": [{"test_name": "Glucose", "result": "130", "flag": "H"}]}
+
+
+@pytest.fixture
+def advisor(monkeypatch):
+    """Advisor whose plan generation returns PLAN and counts calls instead of calling a model."""
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    advisor = SpecialistAdvisor("")
+    advisor.calls = 0
+    
+    def generate(medical_json, findings):
+        advisor.calls += 1
+        return PLAN
+    
+    monkeypatch.setattr(advisor, "_get_health_plan_optimized", generate)
+    return advisor
+
+
+def test_sync_api_works_inside_running_event_loop(advisor):
+    async def handler():
+        return advisor.get_health_recommendations(REPORT)
+    
+    assert asyncio.run(handler()) == PLAN
+
+
+def test_async_api_shares_the_cache(advisor):
+    assert asyncio.run(advisor.aget_health_recommendations(REPORT)) == PLAN
+    assert advisor.get_health_recommendations(REPORT) == PLAN
+    assert advisor.calls == 1
+
+
+def test_read_json_stream_stops_after_first_object():
+    chunks = ['```json\n{"a": {"b": "}"', '}, "c": 1}\n```', "\nMore text {}"]
+    
+    assert _read_json_stream(iter(chunks)) == '{"a": {"b": "}"}, "c": 1}'
+
+
+def test_read_json_stream_skips_braces_in_preamble():
+    chunks = ['Here is the plan {as requested', '}:\n```json\n{\n', '  "diet_plan": {}}\n```']
+    
+    assert _read_json_stream(iter(chunks)) == '{\n  "diet_plan": {}}'
+
+
+def test_read_json_stream_without_object_returns_everything():
+    assert _read_json_stream(iter(["No JSON {here}", " at all"])) == "No JSON {here} at all"
+
+
+def test_read_json_stream_returns_partial_output():
+    assert _read_json_stream(iter(['{"a": "\\"', '}'])) == '{"a": "\\"}'
+    assert _read_json_stream(iter(['{"a": [1, ', '2'])) == '{"a": [1, 2'
+
+
+def test_formatting_stream_is_closed_when_reading_stops_early(advisor):
+    closed = []
+    
+    def chunks():
+        try:
+            for text in ('{"diet_plan": {}}', ' trailing', ' text'):
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+        finally:
+            closed.append(True)
+    
+    # Held here so garbage collection cannot close it on the advisor's behalf
+    stream = chunks()
+    advisor.formatter_client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: stream))
+    )
+    
+    assert advisor._format_with_huggingface("prompt") == {"diet_plan": {}}
+    assert closed == [True]
+
+
+def test_gemini_stream_is_closed_when_reading_stops_early(advisor):
+    closed = []
+    plan = '{"diet_plan": {}, "exercise_plan": {}, "disclaimer": "Not medical advice."}'
+    
+    def chunks():
+        try:
+            for text in (plan, ' trailing', ' text'):
+                yield SimpleNamespace(text=text, parts=[text])
+        finally:
+            closed.append(True)
+    
+    class Response:
+        def __init__(self):
+            # Held here so garbage collection cannot close it on the advisor's behalf
+            self.chunks = chunks()
+        
+        def __iter__(self):
+            return self.chunks
+    
+    response = Response()
+    advisor.gemini_model = SimpleNamespace(generate_content=lambda *args, **kwargs: response)
+    
+    assert advisor._format_with_gemini_or_fallback("plan text") == PLAN
+    assert closed == [True]
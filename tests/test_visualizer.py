@@ -0,0 +1,92 @@
+"""Tests for the medical data visualizer."""
+
+import datetime
+
+import numpy as np
+import pytest
+
+from src.visualizer import MedicalDataVisualizer
+
+
+@pytest.fixture
+def visualizer():
+    return MedicalDataVisualizer()
+
+
+def test_normalize_keeps_null_result_unparsed(visualizer):
+    frame = visualizer._normalize([
+        {"test_name": "Hemoglobin", "result": None, "reference_range": "12-16"},
+        {"test_name": "Glucose", "reference_range": "70-99"},
+    ])
+    
+    # An explicit null is unparseable; only a missing result defaults to "0"
+    assert np.isnan(frame['value'][0])
+    assert frame['value'][1] == 0.0
+
+
+def test_normalize_null_flag_is_unknown(visualizer):
+    frame = visualizer._normalize([{"flag": None}, {}, {"flag": "h"}])
+    
+    assert frame['flag_name'].tolist() == ["Unknown", "Normal", "High"]
+
+
+def test_normalize_mixed_types(visualizer):
+    frame = visualizer._normalize([
+        {"test_name": "Hemoglobin", "result": 13.5, "unit": "g/dL", "reference_range": "12.0-16.0"},
+        {"test_name": "CRP", "result": "<5", "unit": 1, "reference_range": 5},
+        {"result": "95", "reference_range": "70-99"},
+    ])
+    
+    np.testing.assert_array_equal(frame['value'], [13.5, np.nan, 95.0])
+    np.testing.assert_array_equal(frame['low'], [12.0, np.nan, 70.0])
+    np.testing.assert_array_equal(frame['high'], [16.0, np.nan, 99.0])
+    assert frame['unit'].tolist() == ["g/dL", 1, ""]
+    assert frame['test_name'][2] is None
+
+
+def test_null_result_is_not_charted(visualizer):
+    visualizations = dict(visualizer.iter_visualizations({"observations": [
+        {"test_name": "Hemoglobin", "result": "13.5", "reference_range": "12-16", "flag": "N"},
+        {"test_name": "Glucose", "result": None, "reference_range": "70-99", "flag": "H"},
+    ]}))
+    
+    assert "Glucose_gauge" not in visualizations
+    assert list(visualizations['overview_bar'].data[0].x) == ["Hemoglobin"]
+    # Only one flag remains among the charted results, so there is no pie
+    assert "flag_distribution" not in visualizations
+
+
+REPORT = {"observations": [
+    {"test_name": "Hemoglobin", "result": "13.5", "reference_range": "12-16", "flag": "N"},
+    {"test_name": "Glucose", "result": "130", "reference_range": "70-99", "flag": "H"},
+]}
+
+
+def test_json_output_accepts_what_figure_output_accepts(visualizer):
+    report = {**REPORT, "report_details": {"report_date": datetime.date(2024, 1, 2)}}
+    
+    figures = visualizer.create_visualizations(report)
+    serialized = visualizer.create_visualizations(report, output='json')
+    
+    assert serialized.keys() == figures.keys() == {"Hemoglobin_gauge", "Glucose_gauge", "overview_bar", "flag_distribution"}
+    assert all(isinstance(text, str) for text in serialized.values())
+
+
+def test_caches_are_per_instance():
+    first, second = MedicalDataVisualizer(), MedicalDataVisualizer()
+    first.create_visualizations(REPORT, output='json')
+    
+    assert len(first._viz_cache) == 1
+    assert len(second._viz_cache) == 0
+
+
+def test_only_numeric_results_reach_the_overview(visualizer):
+    results = ["13.5", "<5", 7, "", "1e2", " 4.5 ", "abc", None, "nan"]
+    observations = [{"test_name": f"T{i}", "result": result} for i, result in enumerate(results)]
+    
+    bar = dict(visualizer.iter_visualizations({"observations": observations}))['overview_bar'].data[0]
+    
+    # "<5", "", "abc" and null fail float() and are skipped; "nan" parses but is
+    # deliberately skipped too, as NaN marks unusable results; whitespace is allowed
+    assert list(bar.x) == ["T0", "T2", "T4", "T5"]
+    np.testing.assert_array_equal(bar.y, [13.5, 7.0, 100.0, 4.5])